@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput benchmarks for the validators and Schema.
+
+Run with the package on the path, e.g.:
+
+    PYTHONPATH=src python benchmarks/suite.py [-k PATTERN] [--rounds N]
+        [--save] [--compare] [--threshold FRACTION]
+
+Each benchmark is timed for several rounds, and reported as the
+median number of operations per second, with the interquartile range
+as a percentage of the median (a rough measure of how noisy the
+numbers are), and as the number of bytes of memory taken up by the
+result of each operation -- the converted data or the errors --
+which is what a batch accumulates.  An operation is one call of the
+validator or schema, or one record in the batch benchmarks.
+
+--save stores the results as the baseline for this machine and
+Python version, in a JSON file in benchmarks/baselines (or --baseline
+DIR) named after a fingerprint of the machine; with -k, only the
+results of the benchmarks that ran are replaced.  --compare compares
+the results with that baseline, and exits with status 1 if any of the
+benchmarks in the regression groups (schema, date, regex and
+credit_card, or as given by --groups) got slower by more than the
+threshold fraction of the baseline's median, and significantly so:
+the rounds of the two runs are compared with a one-sided Mann-Whitney
+U test, so that noise alone is unlikely to fail the run.
+"""
+
+import datetime
+import hashlib
+import math
+import optparse
+import os
+import platform
+import re
+import sys
+import timeit
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import validino as V
+from validino.memory import deep_size
+
+# (group, name, factory, operations per call), in order of definition
+BENCHMARKS = []
+
+# the groups of benchmarks checked for regressions by default
+REGRESSION_GROUPS = ('schema', 'date', 'regex', 'credit_card')
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'baselines')
+
+
+def benchmark(group, ops=1):
+    """
+    registers a benchmark: the decorated function returns the function
+    to time, which performs ops operations per call and returns what
+    they produced.
+    """
+    def register(factory):
+        BENCHMARKS.append((group, factory.__name__, factory, ops))
+        return factory
+    return register
+
+
+# the signup form of doc/example.py, made runnable
+
+VALID_STATES = ['NJ', 'NY', 'CT', 'AZ']
+
+
+def convert_telephone(tel, context=None):
+    m = re.match(r'(\d{3})[/-]?(\d{3})-?(\d{4})', tel)
+    if m:
+        return ''.join(m.groups())
+    raise V.Invalid("Please enter a valid telephone number (e.g., 555-123-4567)")
+
+
+signup_validators = dict(
+    spank_level=V.either(V.empty(),
+                         V.equal('other'),
+                         V.to_integer("Please enter a valid number of spanks")),
+    preference=V.either(V.empty(),
+                        V.belongs(['chicken',
+                                   'fish',
+                                   'monkey brains',
+                                   'soy meal'])),
+    honorific=V.either(V.empty(), V.belongs(['Dr.', 'Mr.',
+                                             'Ms.', 'Mrs.',
+                                             'Rear Admiral'])),
+    firstname=(V.strip,
+               V.not_empty("Please enter a first name"),
+               V.clamp_length(min=1, max=20)),
+    middlename=(V.strip,
+                V.either(V.empty(),
+                         V.clamp_length(max=20))),
+    lastname=(V.strip,
+              V.not_empty("Please enter a last name"),
+              V.clamp_length(min=1, max=40)),
+    address1=(V.strip,
+              V.not_empty("Please enter an address"),
+              V.clamp_length(min=1, max=40)),
+    address2=(V.strip,
+              V.default(''),
+              V.clamp_length(max=40)),
+    city=(V.strip,
+          V.not_empty("Please enter a city"),
+          V.clamp_length(min=1, max=30)),
+    state=(V.default(''), V.belongs(VALID_STATES)),
+    zip_code=(V.strip,
+              V.not_empty("Please enter a zip code"),
+              V.clamp_length(max=5)),
+    zip_extension=(V.strip,
+                   V.default(''),
+                   V.clamp_length(max=4)),
+    phone=(V.strip,
+           V.either(V.empty(),
+                    convert_telephone)),
+    email=(V.not_empty("Please enter an email address"),
+           V.email(msg="Please enter a valid email address")),
+    email_confirm=V.strip,
+    comment=(V.strip,
+             V.default(''),
+             V.clamp_length(max=200)))
+signup_validators[('email', 'email_confirm')] = V.fields_equal(
+    msg='Please re-enter your email address',
+    field='email_confirm')
+
+signup = V.Schema(signup_validators,
+                  msg="The submitted data contains naughty errors.")
+
+signup_good = dict(spank_level='3',
+                   preference='fish',
+                   honorific='Dr.',
+                   firstname=' Jacob ',
+                   lastname='Smullyan',
+                   address1='1 Main St',
+                   city='New York',
+                   state='NY',
+                   zip_code='10001',
+                   phone='555-123-4567',
+                   email='jacob@example.com',
+                   email_confirm='jacob@example.com')
+
+signup_bad = dict(signup_good,
+                  spank_level='many',
+                  firstname='',
+                  state='XX',
+                  phone='call me',
+                  email='jacob',
+                  email_confirm='jacob@example.org')
+
+
+def _call(schema, data):
+    try:
+        return schema(dict(data))
+    except V.Invalid, e:
+        return e.unpack_errors()
+
+
+@benchmark('schema')
+def signup_valid():
+    return lambda: _call(signup, signup_good)
+
+
+@benchmark('schema')
+def signup_invalid():
+    return lambda: _call(signup, signup_bad)
+
+
+@benchmark('schema')
+def signup_codegen():
+    generated = V.Schema(signup_validators, codegen=True)
+    return lambda: _call(generated, signup_good)
+
+
+@benchmark('schema')
+def signup_codegen_invalid():
+    generated = V.Schema(signup_validators, codegen=True)
+    return lambda: _call(generated, signup_bad)
+
+
+@benchmark('schema')
+def optional_fields():
+    # almost entirely optional fields, using the either(empty(), ...)
+    # idiom, filled in with (mostly valid) values
+    schema = V.Schema(dict(
+        ('field%d' % i, V.either(V.empty(),
+                                 V.all_of(V.to_integer(), V.clamp(min=0))))
+        for i in range(20)))
+    data = dict(('field%d' % i, str(i)) for i in range(20))
+    data['field7'] = 'seven'
+    return lambda: _call(schema, data)
+
+
+# deeply nested payloads: an order with 50 lines
+
+line = V.Schema(dict(
+    sku=(V.strip, V.regex(r'^[A-Z]{3}-\d{4}$', 'bad sku')),
+    quantity=(V.to_integer('quantity'), V.clamp(min=1, max=100)),
+    product=V.nested(name=V.not_empty(),
+                     price=V.nested(amount=V.to_integer(),
+                                    currency=V.belongs(['USD', 'EUR'])))))
+
+order = V.Schema(dict(
+    id=V.uuid(),
+    customer=V.nested(name=(V.strip, V.not_empty()),
+                      email=V.email()),
+    lines=V.nested_many(line)))
+
+
+def order_data(bad=False):
+    lines = {}
+    for i in range(50):
+        lines[i] = dict(sku='ABC-%04d' % i,
+                        quantity=str(i % 7 + 1),
+                        product=dict(name='thing %d' % i,
+                                     price=dict(amount=str(i * 100),
+                                                currency='USD')))
+        if bad and i % 5 == 0:
+            lines[i]['sku'] = 'abc'
+            lines[i]['product']['price']['currency'] = 'GBP'
+    return dict(id='3e1a1e0a-6a1b-11dc-8314-0800200c9a66',
+                customer=dict(name=' Jacob ', email='jacob@example.com'),
+                lines=lines)
+
+
+@benchmark('nested')
+def nested_valid():
+    data = order_data()
+    return lambda: _call(order, data)
+
+
+@benchmark('nested')
+def nested_invalid():
+    data = order_data(bad=True)
+    return lambda: _call(order, data)
+
+
+# individual validators, over a thousand inputs each
+
+def _apply_all(validator, values):
+    def run():
+        result = []
+        for v in values:
+            try:
+                result.append(validator(v))
+            except V.Invalid, e:
+                result.append(e)
+        return result
+    return run
+
+
+_start = datetime.datetime(2007, 1, 1)
+dates = [(_start + datetime.timedelta(days=i)).strftime('%Y-%m-%d')
+         for i in range(1000)]
+datetimes = [(_start + datetime.timedelta(minutes=7 * i))
+             .strftime('%Y-%m-%d %H:%M') for i in range(1000)]
+
+
+@benchmark('date', ops=1000)
+def parse_date():
+    return _apply_all(V.parse_date('%Y-%m-%d'), dates)
+
+
+@benchmark('date', ops=1000)
+def parse_datetime():
+    return _apply_all(V.parse_datetime('%Y-%m-%d %H:%M'), datetimes)
+
+
+@benchmark('date', ops=1000)
+def parse_date_invalid():
+    return _apply_all(V.parse_date('%Y-%m-%d'),
+                      ['2007-13-%02d' % (i % 40) for i in range(1000)])
+
+
+# valid Visa numbers, and the same numbers with a wrong check digit
+cards = []
+for _i in range(1000):
+    _digits = [int(c) for c in '4000%011d' % (_i * 7919)]
+    _total = 0
+    for _j, _d in enumerate(reversed(_digits)):
+        if _j % 2 == 0:
+            _d *= 2
+        _total += _d // 10 + _d % 10
+    cards.append('4000%011d%d' % (_i * 7919, (10 - _total % 10) % 10))
+bad_cards = [c[:-1] + str((int(c[-1]) + 1) % 10) for c in cards]
+
+
+@benchmark('credit_card', ops=1000)
+def credit_card_valid():
+    return _apply_all(V.credit_card(), cards)
+
+
+@benchmark('credit_card', ops=1000)
+def credit_card_invalid():
+    return _apply_all(V.credit_card(), bad_cards)
+
+
+@benchmark('regex', ops=1000)
+def ip():
+    values = ['192.168.%d.%d' % (i // 256, i % 256) for i in range(500)]
+    values += ['192.168.%d.x' % i for i in range(500)]
+    return _apply_all(V.ip(), values)
+
+
+@benchmark('regex', ops=1000)
+def regex():
+    values = ['ABC-%04d' % i for i in range(500)]
+    values += ['abc-%04d' % i for i in range(500)]
+    return _apply_all(V.regex(r'^[A-Z]{3}-\d{4}$'), values)
+
+
+# flattening and nesting a form of 10,000 keys
+
+flat_form = dict(('section%d.group%d.field%d' % (i // 1000, i // 100 % 10,
+                                                 i % 100), str(i))
+                 for i in range(10000))
+nested_form = V.dict_nest(flat_form)
+
+
+@benchmark('dict')
+def dict_nest():
+    return lambda: V.dict_nest(flat_form)
+
+
+@benchmark('dict')
+def dict_unnest():
+    return lambda: V.dict_unnest(nested_form)
+
+
+# a batch of 10,000 records, 90% of them failing
+
+batch_schema = V.Schema(dict(
+    id=V.to_integer('id'),
+    name=(V.strip, V.not_empty('name'), V.clamp_length(max=20)),
+    email=V.email(msg='email'),
+    joined=V.parse_date('%Y-%m-%d', 'joined')),
+    msg='bad record')
+
+
+def batch_records():
+    records = []
+    for i in range(10000):
+        record = dict(id=str(i),
+                      name='user %d' % i,
+                      email='user%d@example.com' % i,
+                      joined=dates[i % 1000])
+        if i % 10:
+            record['email'] = 'user %d' % i
+        if i % 3 == 0:
+            record['joined'] = 'yesterday'
+        records.append(record)
+    return records
+
+
+@benchmark('batch', ops=10000)
+def batch_failures():
+    records = batch_records()
+    return lambda: list(batch_schema.validate_many(records))
+
+
+@benchmark('batch', ops=10000)
+def batch_failures_compact():
+    records = batch_records()
+    return lambda: list(batch_schema.validate_many(records, compact=True))
+
+
+def _median(values):
+    return _quantile(values, 0.5)
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    pos = (len(values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def _bytes_per_op(func, ops):
+    """
+    returns the memory taken up by the result of each operation.
+    """
+    return float(deep_size(func())) / ops
+
+
+def measure(func, ops, rounds=7, min_time=0.2):
+    """
+    times func for the given number of rounds of at least min_time
+    seconds each, returning a list of the operations per second of
+    each round.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time / 5:
+        number *= 2
+    number *= 5
+    return [number * ops / timer.timeit(number) for i in range(rounds)]
+
+
+def run(pattern=None, rounds=7, min_time=0.2, out=None):
+    """
+    runs the benchmarks whose group or name matches the regular
+    expression pattern (all of them by default), printing a line for
+    each to out if it is given, and returns a list of dictionaries of
+    the results.
+    """
+    results = []
+    for group, name, factory, ops in BENCHMARKS:
+        fullname = '%s.%s' % (group, name)
+        if pattern and not re.search(pattern, fullname):
+            continue
+        func = factory()
+        samples = measure(func, ops, rounds, min_time)
+        median = _median(samples)
+        iqr = _quantile(samples, 0.75) - _quantile(samples, 0.25)
+        result = dict(name=fullname,
+                      samples=samples,
+                      median=median,
+                      iqr=iqr,
+                      bytes=_bytes_per_op(func, ops))
+        results.append(result)
+        if out is not None:
+            print >> out, '%-32s %12.0f ops/sec  +-%5.1f%%  %8.0f bytes/op' % (
+                fullname, median, 100 * iqr / median, result['bytes'])
+    return results
+
+
+def fingerprint():
+    """
+    returns a short identifier of this machine and Python version,
+    which names its baseline file.
+    """
+    try:
+        import multiprocessing
+        cpus = multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        cpus = 0
+    machine = '|'.join(str(x) for x in (platform.node(),
+                                        platform.system(),
+                                        platform.machine(),
+                                        platform.processor(),
+                                        cpus))
+    return '%s-%s-py%d.%d' % (platform.node() or 'unknown',
+                              hashlib.sha1(machine).hexdigest()[:8],
+                              sys.version_info[0],
+                              sys.version_info[1])
+
+
+def baseline_path(directory=BASELINE_DIR):
+    return os.path.join(directory, fingerprint() + '.json')
+
+
+def save(results, path, merge=False):
+    """
+    writes results to the baseline at path; if merge is true, they
+    replace only the results of the same benchmarks in the baseline
+    already there, if any, rather than all of them.
+    """
+    saved = {}
+    if merge and os.path.exists(path):
+        saved = load(path)['results']
+    saved.update((r['name'], r) for r in results)
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    f = open(path, 'w')
+    try:
+        json.dump(dict(fingerprint=fingerprint(),
+                       python=platform.python_version(),
+                       validino=V.__version__,
+                       results=saved),
+                  f, indent=1, sort_keys=True)
+    finally:
+        f.close()
+
+
+def load(path):
+    f = open(path)
+    try:
+        return json.load(f)
+    finally:
+        f.close()
+
+
+def _normal_sf(z):
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def slower_p_value(baseline, current):
+    """
+    returns the p-value of a one-sided Mann-Whitney U test of the
+    hypothesis that the current samples (operations per second) are
+    lower than the baseline samples, using the normal approximation
+    with a correction for ties.
+    """
+    n1, n2 = len(current), len(baseline)
+    n = n1 + n2
+    if not n1 or not n2:
+        return 1.0
+    u = 0.0
+    for c in current:
+        for b in baseline:
+            if c > b:
+                u += 1
+            elif c == b:
+                u += 0.5
+    mean = n1 * n2 / 2.0
+    # each group of t tied samples reduces the variance of u
+    ties = {}
+    for x in list(current) + list(baseline):
+        ties[x] = ties.get(x, 0) + 1
+    ties = sum(t ** 3 - t for t in ties.itervalues())
+    var = n1 * n2 / 12.0 * (n + 1 - ties / float(n * (n - 1)))
+    sd = math.sqrt(max(var, 0.0))
+    if not sd:
+        return 1.0
+    # a small u means the current samples rank low
+    return _normal_sf((mean - u - 0.5) / sd)
+
+
+def compare(baseline, results, threshold=0.05, groups=REGRESSION_GROUPS,
+            alpha=0.05, out=None):
+    """
+    compares results with a loaded baseline, printing a line per
+    benchmark to out if it is given, and returns the names of the
+    benchmarks in groups that regressed: that got slower by more than
+    threshold (as a fraction of the baseline median) with a p-value
+    below alpha.
+    """
+    regressions = []
+    old = baseline['results']
+    for result in results:
+        name = result['name']
+        if name not in old:
+            if out is not None:
+                print >> out, '%-32s %12s' % (name, 'new')
+            continue
+        before = old[name]
+        change = float(result['median']) / before['median'] - 1
+        p = slower_p_value(before['samples'], result['samples'])
+        regressed = (change < -threshold and p < alpha
+                     and name.split('.')[0] in groups)
+        if regressed:
+            regressions.append(name)
+        if out is not None:
+            print >> out, '%-32s %12.0f -> %12.0f ops/sec %+7.1f%%  p=%.3f%s' % (
+                name, before['median'], result['median'], 100 * change, p,
+                regressed and '  REGRESSION' or '')
+    return regressions
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-k', dest='pattern',
+                      help='only run the benchmarks matching PATTERN')
+    parser.add_option('--rounds', type='int', default=7,
+                      help='number of timed rounds [%default]')
+    parser.add_option('--min-time', type='float', default=0.2,
+                      help='minimum seconds per round [%default]')
+    parser.add_option('--baseline', default=BASELINE_DIR, metavar='DIR',
+                      help='directory of the baselines [%default]')
+    parser.add_option('--save', action='store_true',
+                      help='store the results as the baseline (with -k, '
+                      'only those of the benchmarks run)')
+    parser.add_option('--compare', action='store_true',
+                      help='compare the results with the baseline')
+    parser.add_option('--threshold', type='float', default=0.05,
+                      help='slowdown, as a fraction of the baseline, '
+                      'that counts as a regression [%default]')
+    parser.add_option('--groups', default=','.join(REGRESSION_GROUPS),
+                      help='comma-separated groups checked for '
+                      'regressions [%default]')
+    options, args = parser.parse_args(argv)
+    path = baseline_path(options.baseline)
+    if options.compare and not os.path.exists(path):
+        parser.error('no baseline at %s; run with --save first' % path)
+    results = run(options.pattern, options.rounds, options.min_time,
+                  sys.stdout)
+    status = 0
+    if options.compare:
+        print
+        print 'compared with %s' % path
+        regressions = compare(load(path), results, options.threshold,
+                              options.groups.split(','), out=sys.stdout)
+        if regressions:
+            print
+            print '%d regression(s): %s' % (len(regressions),
+                                            ', '.join(regressions))
+            status = 1
+    if options.save:
+        # a partial run only replaces the benchmarks it ran
+        save(results, path, merge=bool(options.pattern))
+        print 'saved baseline %s' % path
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -31,6 +31,8 @@ __data__ = dict(
     include_package_data=True,
     packages=['validino'],
     package_dir={'' : 'src'},
+    entry_points={
+        'console_scripts': ['validino-check = validino.cli:main']},
     test_suite='nose.collector')
 
 if __name__ == '__main__':
@@ -38,5 +38,8 @@ various subvalidators.  For instance:
 from validino.base import *
 from validino.extra import *
 from validino.field import *
+from validino.memory import *
+from validino.observe import *
+from validino.report import *
 
 __version__='0.2.2'
@@ -1,16 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import Queue
 import datetime
 import re
+import sys
+import threading
 import time
 from uuid import UUID, uuid1
 import types
 import copy
-import functools
+import weakref
 
 from validino import util
 
 __all__ = [
+    'FAIL_FAST',
     'Invalid',
     'check',
     'clamp',
@@ -30,7 +34,9 @@ __all__ = [
     'is_scalar',
     'not_equal',
     'uuid',
+    'Validator',
     'is_integer',
+    'memoize',
     'to_integer',
     'to_boolean',
     'not_empty',
@@ -42,6 +48,7 @@ __all__ = [
     'regex',
     'regex_sub',
     'Schema',
+    'SchemaState',
     'strip',
     'to_list',
     'to_scalar',
@@ -55,7 +62,28 @@ __all__ = [
     'only_one_of']
 
 
-_default = object()
+class _Default(object):
+    """
+    the type of the _default marker, which is kept a singleton when
+    pickled.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        return '_default'
+
+    def __repr__(self):
+        return '_default'
+
+_default = _Default()
+
+# the context key that asks Schema, nested and nested_many to stop at
+# the first error.
+FAIL_FAST = 'validino.fail_fast'
+
+# the observer of the schemas without one of their own, set by
+# validino.observe.instrument().
+_observer = None
 
 def _add_error_message(d, k, msg):
     """
@@ -67,6 +95,14 @@ def _add_error_message(d, k, msg):
         d[k].append(msg)
 
 
+def _fail_fast(context):
+    """
+    internal: tells whether the context asks for validation to stop at
+    the first error.
+    """
+    return isinstance(context, dict) and context.get(FAIL_FAST, False)
+
+
 def _msg(msg, key, default):
     """
     internal message-handling routine.
@@ -117,42 +153,57 @@ def dict_unnest(data, separator='.'):
 
 
 class Invalid(Exception):
-    """A general Exception for things that are Invalid"""
+    """
+    A general Exception for things that are Invalid.
+
+    The errors are kept as given until they are needed: a single
+    message only becomes a dictionary when the errors attribute is
+    read, and nested errors are only flattened by unpack_errors().
+    """
+    __slots__ = ('_errors', '_raw', 'field')
+
     def __init__(self, errors=None, field=_default):
-        if not errors:
-            errors = dict()
-        elif not isinstance(errors, dict):
-            errors = {None: errors}
         if not field is _default:
             self.field = field
         Exception.__init__(self, errors)
-        self.errors = errors
+        self._errors = errors
+        self._raw = True
+
+    def _get_errors(self):
+        errors = self._errors
+        if self._raw:
+            if isinstance(errors, dict):
+                for k, v in errors.items():
+                    if type(v) is _Failure:
+                        errors[k] = v.unpacked()
+            elif not errors:
+                errors = dict()
+            else:
+                errors = {None: errors}
+            self._errors = errors
+            self._raw = False
+        return errors
 
-    def _unpack_error(self, name, error):
-        if isinstance(error, dict):
-            result = dict(
-                [self._unpack_error(key, value) for (key, value) in error.iteritems()])
-        elif isinstance(error, (list, tuple)):
-            name, result = self._unpack_error(name, error[0])
-        elif isinstance(error, Invalid):
-            name = getattr(error, 'field', name)
-            result = error._unpack_errors()
-        else:
-            result = error
-        return (name, result)
+    def _set_errors(self, errors):
+        self._errors = errors
+        self._raw = True
 
-    def _unpack_errors(self):
-        result = dict()
-        for key, value in self.errors.iteritems():
-            name, error = self._unpack_error(key, value)
-            result[name] = error
+    errors = property(_get_errors, _set_errors)
 
-        if result.keys() == [None]:
-            return result[None]
-        elif result.keys() == ['']:
-            return result['']
-        else:
-            return result
+    def __str__(self):
+        return str(self.errors)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.errors)
+
+    def __reduce__(self):
+        return (type(self), (self.errors, getattr(self, 'field', _default)))
+
+    def _unpack_errors(self):
+        errors = self._errors
+        if isinstance(errors, basestring) and errors:
+            return errors
+        return _unpack(_error_dict(errors))
 
     def unpack_errors(self):
         result = self._unpack_errors()
@@ -161,8 +212,419 @@ class Invalid(Exception):
         else:
             return result
 
+    def compact_errors(self, table=None):
+        """
+        returns the unpacked errors as a sorted tuple of (path,
+        message) pairs (see util.compact_errors(), to which table is
+        passed on), which takes up far less memory when many records
+        with the same errors are kept.
+        """
+        return util.compact_errors(self.unpack_errors(), table)
+
+
+def _error_dict(errors):
+    """
+    internal: returns the dictionary that Invalid(errors).errors
+    would be.
+    """
+    if isinstance(errors, dict):
+        return errors
+    elif not errors:
+        return {}
+    else:
+        return {None: errors}
+
+
+def _unpack(errors):
+    """
+    internal: flattens a dictionary of errors, replacing lists by
+    their first element and Invalid exceptions by their own unpacked
+    errors, stored under the exception's field if it has one.  A
+    dictionary of errors whose only key is None or '' (other than one
+    nested directly in another dictionary) collapses to that key's
+    value.
+
+    This is done with an explicit stack rather than by recursion, so
+    that errors nested to any depth can be unpacked.
+    """
+    # each frame is (remaining items, unpacked result so far, whether
+    # to collapse the result, the parent's result, name in the parent)
+    stack = [(errors.iteritems(), {}, True, None, None)]
+    while True:
+        items, result, collapse, parent, pname = stack[-1]
+        for name, error in items:
+            while isinstance(error, (list, tuple)):
+                error = error[0]
+            if isinstance(error, dict):
+                stack.append((error.iteritems(), {}, False, result, name))
+                break
+            elif isinstance(error, Invalid):
+                name = getattr(error, 'field', name)
+                sub = _error_dict(error._errors)
+                stack.append((sub.iteritems(), {}, True, result, name))
+                break
+            elif type(error) is _Failure:
+                name = error.name(name)
+                if error.exception is not None:
+                    sub = _error_dict(error.exception._errors)
+                else:
+                    sub = _error_dict(error.errors)
+                stack.append((sub.iteritems(), {}, True, result, name))
+                break
+            result[name] = error
+        else:
+            stack.pop()
+            if collapse and len(result) == 1:
+                if None in result:
+                    result = result[None]
+                elif '' in result:
+                    result = result['']
+            if parent is None:
+                return result
+            parent[pname] = result
 
-class Schema(object):
+
+class _Failure(object):
+    """
+    internal: what a validator's _apply() method returns where calling
+    it would raise Invalid.  errors and field are the arguments the
+    Invalid would be created with, or exception is an Invalid that was
+    caught from a validator that raised it.
+    """
+    __slots__ = ('errors', 'field', 'exception')
+
+    def __init__(self, errors=None, field=_default, exception=None):
+        self.errors = errors
+        self.field = field
+        self.exception = exception
+
+    def invalid(self):
+        """
+        returns the Invalid to raise for this failure.
+        """
+        if self.exception is not None:
+            return self.exception
+        elif self.field is _default:
+            return Invalid(self.errors)
+        else:
+            return Invalid(self.errors, field=self.field)
+
+    def name(self, default):
+        """
+        returns the field name the error should be reported under.
+        """
+        if self.exception is not None:
+            return getattr(self.exception, 'field', default)
+        elif self.field is _default:
+            return default
+        else:
+            return self.field
+
+    def unpacked(self):
+        """
+        returns what _unpack_errors() would return for the Invalid.
+        """
+        if self.exception is not None:
+            return self.exception._unpack_errors()
+        errors = self.errors
+        if isinstance(errors, basestring) and errors:
+            return errors
+        return _unpack(_error_dict(errors))
+
+
+def _process_pool(executor):
+    """
+    internal: tells whether executor runs its tasks in other
+    processes.
+    """
+    from multiprocessing.pool import Pool, ThreadPool
+    if isinstance(executor, Pool) and not isinstance(executor, ThreadPool):
+        return True
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+    except ImportError:
+        return False
+    return isinstance(executor, ProcessPoolExecutor)
+
+
+def _copy_invalid(e):
+    """
+    internal: returns a new Invalid with a copy of the errors of e.
+    """
+    return Invalid(copy.deepcopy(e.errors), getattr(e, 'field', _default))
+
+
+class Validator(object):
+    """
+    base class of the built-in validators.
+
+    A validator is called with a value and an optional context, and
+    returns the converted value or raises Invalid.  The parameters it
+    was created with are kept in slots, and returned as a dictionary
+    by the params attribute; they also determine equality, hashing and
+    pickling, so validators and the schemas built from them can be
+    compared, used as dictionary keys and sent to other processes.
+
+    Subclasses implement _apply(value, context), which returns a
+    _Failure instead of raising Invalid, so that the combinators and
+    Schema can run validators without raising and catching an
+    exception for every failure.  Slots whose names begin with an
+    underscore are not parameters, but derived from them by _setup().
+    The parameters named in _local_params, such as observers, only
+    make sense in this process: they are left out of equality,
+    hashing and pickling, and are None after unpickling.
+
+    pure is true for validators whose result depends only on the
+    value (not on the context or anything else) and is worth caching;
+    a Schema with a cache_size wraps those in memoize().
+
+    io_bound is true for validators that spend their time waiting on
+    the network or the disk, such as email(check_dns=True); a Schema
+    validating concurrently runs those in threads (see
+    Schema.validate_concurrent()).  Plain functions can be marked by
+    setting the attribute on them.
+    """
+    __slots__ = ()
+
+    _local_params = ()
+
+    pure = False
+    io_bound = False
+
+    @property
+    def __name__(self):
+        return type(self).__name__
+
+    def _param_names(self):
+        names = []
+        for cls in reversed(type(self).__mro__):
+            names.extend(k for k in cls.__dict__.get('__slots__', ())
+                         if not k.startswith('_'))
+        return names
+
+    @property
+    def params(self):
+        return dict((k, getattr(self, k)) for k in self._param_names())
+
+    def __getstate__(self):
+        state = self.params
+        for k in self._local_params:
+            del state[k]
+        return state
+
+    def __setstate__(self, state):
+        for k in self._local_params:
+            setattr(self, k, None)
+        for k, v in state.iteritems():
+            setattr(self, k, v)
+        self._setup()
+
+    def _setup(self):
+        """
+        computes any private slots from the parameters.
+        """
+        pass
+
+    def __eq__(self, other):
+        return (type(self) is type(other)
+                and self.__getstate__() == other.__getstate__())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        try:
+            return hash((type(self), util.freeze(self.__getstate__())))
+        except TypeError:
+            return hash(type(self))
+
+    def __repr__(self):
+        params = ', '.join('%s=%r' % (k, getattr(self, k))
+                           for k in self._param_names())
+        return '%s(%s)' % (self.__name__, params)
+
+    def __call__(self, value, context=None):
+        result = self._apply(value, context)
+        if type(result) is _Failure:
+            raise result.invalid()
+        return result
+
+    def _apply(self, value, context):
+        """
+        returns the converted value, or a _Failure if value is invalid.
+        Every subclass must override it.
+        """
+        raise NotImplementedError('%s does not implement _apply()'
+                                  % type(self).__name__)
+
+_validator_call = Validator.__call__.im_func
+
+
+def _applier(validator, keyword=True):
+    """
+    internal: returns a function of (value, context) that applies
+    validator, returning a _Failure rather than raising Invalid.  If
+    validator has to be called, keyword tells whether to pass the
+    context as a keyword argument (as the combinators do) or
+    positionally (as Schema does).
+    """
+    if (isinstance(validator, Validator)
+        and type(validator).__call__.im_func is _validator_call):
+        return validator._apply
+    if keyword:
+        def apply(value, context):
+            try:
+                return validator(value, context=context)
+            except Invalid, e:
+                return _Failure(exception=e)
+    else:
+        def apply(value, context):
+            try:
+                return validator(value, context)
+            except Invalid, e:
+                return _Failure(exception=e)
+    return apply
+
+
+def _io_bound(validators):
+    """
+    internal: tells whether any of validators is I/O-bound (see
+    Validator.io_bound).
+    """
+    for v in validators:
+        if getattr(v, 'io_bound', False):
+            return True
+    return False
+
+
+def _sorted(keys):
+    """
+    internal: sorts keys, falling back on their reprs if they cannot
+    all be compared with each other.
+    """
+    try:
+        return sorted(keys)
+    except TypeError:
+        return sorted(keys, key=repr)
+
+
+class _SchemaPlan(object):
+    """
+    internal, immutable execution plan for a Schema, built once from
+    its subvalidators by Schema.compile().
+
+    A plural key has to run after the singular keys among its atoms,
+    whose converted values it sees, and the plural keys sharing an
+    atom with it run in sorted order, each seeing the values the
+    earlier ones converted.  Running the singular keys, sorted, and
+    then the plural keys, sorted, satisfies both, so no separate
+    dependency graph is built.  dependents maps each atom to the
+    plural keys mentioning it, in that order.
+
+    steps is a tuple of (key, have_plural, validator, apply) tuples in
+    execution order.  List and
+    tuple subvalidators are already composed with all_of(), and apply
+    is the validator's _applier().  index maps each key to the
+    position of its step.  keys is a frozenset of every atom mentioned
+    in the schema keys, and plural_keys a tuple of the plural keys in
+    execution order.
+
+    If codegen is true, function is the specialised field loop
+    generated from the steps by validino.codegen, and source its
+    source code; otherwise both are None.
+
+    If cache_size is not 0, the pure subvalidators are wrapped in
+    memoize(), with cache_size and cache_ttl, and caches is a tuple of
+    the memoize instances.
+
+    io_keys is a frozenset of the singular keys whose validators are
+    I/O-bound (see Validator.io_bound).
+
+    observed(observer) returns the steps instrumented for observer.
+    """
+    __slots__ = ('steps',
+                 'index',
+                 'keys',
+                 'plural_keys',
+                 'dependents',
+                 'function',
+                 'source',
+                 'caches',
+                 'io_keys',
+                 '_observed')
+
+    def __init__(self, subvalidators, codegen=False, cache_size=0,
+                 cache_ttl=None):
+        singular = []
+        plural = []
+        for k in subvalidators:
+            if isinstance(k, (list, tuple)):
+                plural.append(k)
+            else:
+                singular.append(k)
+        singular = _sorted(singular)
+        plural = _sorted(plural)
+
+        keys = set(singular)
+        dependents = {}
+        for k in plural:
+            keys.update(k)
+            for x in k:
+                dependents.setdefault(x, []).append(k)
+
+        steps = []
+        caches = []
+        io_keys = []
+        for k in singular + plural:
+            vfunc = subvalidators[k]
+            if cache_size != 0:
+                vfunc = _memoized(vfunc, cache_size, cache_ttl, caches)
+            if isinstance(vfunc, (list, tuple)):
+                vfunc = all_of(*vfunc)
+            have_plural = isinstance(k, (list, tuple))
+            if not have_plural and getattr(vfunc, 'io_bound', False):
+                io_keys.append(k)
+            steps.append((k, have_plural, vfunc, _applier(vfunc, False)))
+        self.steps = tuple(steps)
+        self.index = dict((step[0], i) for i, step in enumerate(steps))
+        self.keys = frozenset(keys)
+        self.plural_keys = tuple(plural)
+        self.dependents = dict((x, tuple(ks)) for x, ks in dependents.iteritems())
+        self.caches = tuple(caches)
+        self.io_keys = frozenset(io_keys)
+        self._observed = weakref.WeakKeyDictionary()
+        if codegen:
+            from validino.codegen import generate
+            self.function, self.source = generate(self.steps)
+        else:
+            self.function = self.source = None
+
+    def observed(self, observer):
+        # the instrumented steps only hold a weak reference to the
+        # observer, so they are dropped along with it
+        try:
+            return self._observed[observer]
+        except KeyError:
+            pass
+        except TypeError:
+            # observers which cannot be weakly referenced are not cached
+            from validino.observe import observed_steps
+            return observed_steps(self.steps, observer)
+        from validino.observe import observed_steps
+        steps = self._observed[observer] = observed_steps(self.steps, observer)
+        return steps
+
+    def steps_for(self, observer):
+        """
+        returns the steps instrumented for observer, or the plain
+        steps if it is None.
+        """
+        if observer is None:
+            return self.steps
+        return self.observed(observer)
+
+
+class Schema(Validator):
     """
     creates a validator from a dictionary of subvalidators that will
     be used to validate a dictionary of data, returning a new
@@ -183,329 +645,1159 @@ class Schema(object):
     key)).  In either case, the return value of the subvalidator
     should match the structure of the input.
 
-    The subvalidators are sorted by key before being executed.  Therefore,
-    subvalidators with plural keys will always be executed after those
-    with singular keys.
+    The subvalidators with singular keys are executed first, sorted by
+    key, followed by those with plural keys, also sorted.  A
+    subvalidator with a plural key is skipped if any of its fields has
+    already failed (in its own subvalidator or in an earlier plural
+    one), so that one bad value does not cause a cascade of errors.
 
     If allow_missing is False, then any missing keys in the input will
     give rise to an error.  Similarly, if allow_extra is False, any
     extra keys will result in an error.
-    """
+
+    The sorting and composition of the subvalidators is done once, by
+    compile(), the first time the schema is called.  Assigning a new
+    dictionary to the subvalidators attribute discards the compiled
+    plan; if you mutate the dictionary (or a list of subvalidators in
+    it) in place, call invalidate() afterwards.  The plan is not
+    pickled, but rebuilt after unpickling.
+
+    If codegen is True, compile() also generates a Python function
+    specialised for this schema, which runs the field loop as
+    straight-line code with the most common built-in validators
+    (strip, not_empty, clamp_length, default, belongs, to_integer)
+    inlined.  The results and errors are the same as without it.
+
+    If fail_fast is True, or the context is a dictionary in which
+    FAIL_FAST is true, validation stops at the first field with an
+    error, and only that error (and the schema's message) is reported.
+    A fail_fast schema also sets FAIL_FAST in (a copy of) a dictionary
+    context, so that nested schemas and nested() and nested_many()
+    validators stop early too.
+
+    If cache_size is not 0, each pure subvalidator (see Validator.pure)
+    given for a key, directly or in a list, is wrapped in memoize()
+    with maxsize cache_size (None for no limit) and ttl cache_ttl.
+    cache_info() sums up the statistics of those caches.
+
+    If record_cache_size is not 0, the outcome of validating each
+    input dictionary is cached as a whole, in an LRU cache of at most
+    record_cache_size entries (None for no limit) which expire after
+    record_cache_ttl seconds if it is given, so that an identical
+    dictionary is not validated again: a deep copy of the cached
+    result is returned, or a new Invalid with a copy of the cached
+    errors raised, so that callers never share nested values with
+    the cache or with each other.  The key is
+    made of the input (compared by value and type, recursively) and,
+    for a dictionary context, the values of the context keys listed
+    in context_keys, which should be all the keys the subvalidators
+    look at; any other context is part of the key as a whole.  Input
+    that cannot be hashed is always validated.  invalidate() empties
+    the cache, and record_cache_info() returns its statistics.
+
+    If observer is given, or an observer was installed with
+    validino.instrument(), the time taken by each field and each
+    subvalidator, and their outcomes, are reported to it (see
+    validino.observe); the generated field loop is not used then.
+    The observer is not compared or pickled, so an instrumented schema
+    can still be sent to other processes, without it.
+
+    validate_concurrent() runs the I/O-bound subvalidators (see
+    Validator.io_bound) of singular keys in threads, concurrently with
+    each other and with the rest; validate_stream() validates a
+    stream of records several at a time.
+
+    If executor is given, every validation (by calling the schema,
+    validate_many() and so on) runs the I/O-bound subvalidators of
+    singular keys in it, as validate_concurrent() does in threads of
+    its own.  executor is either a thread pool with an apply_async()
+    method, such as multiprocessing.pool.ThreadPool, or one with a
+    submit() method, such as concurrent.futures.ThreadPoolExecutor.
+    A schema nested in an I/O-bound field should not use the same
+    executor, lest all its threads end up waiting on each other.
+    Process pools cannot run the validators and are refused.  Like the
+    observer, the executor is not compared or pickled.
+    """
+    __slots__ = ('_subvalidators',
+                 'msg',
+                 'allow_missing',
+                 'allow_extra',
+                 'filter_extra',
+                 'codegen',
+                 'fail_fast',
+                 'cache_size',
+                 'cache_ttl',
+                 'record_cache_size',
+                 'record_cache_ttl',
+                 'context_keys',
+                 'observer',
+                 'executor',
+                 '_plan',
+                 '_records',
+                 '_submit')
+
+    _local_params = ('observer', 'executor')
 
     def __init__(self,
                  subvalidators,
                  msg=None,
                  allow_missing=True,
                  allow_extra=True,
-                 filter_extra=True):
+                 filter_extra=True,
+                 codegen=False,
+                 fail_fast=False,
+                 cache_size=0,
+                 cache_ttl=None,
+                 record_cache_size=0,
+                 record_cache_ttl=None,
+                 context_keys=(),
+                 observer=None,
+                 executor=None):
+        self.codegen = codegen
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.record_cache_size = record_cache_size
+        self.record_cache_ttl = record_cache_ttl
+        self.context_keys = context_keys
+        self.observer = observer
+        self.executor = executor
         self.subvalidators = subvalidators
         self.msg = msg
         self.allow_missing = allow_missing
         self.allow_extra = allow_extra
         self.filter_extra = filter_extra
+        self.fail_fast = fail_fast
+        self._setup()
+
+    def _setup(self):
+        if self.record_cache_size != 0:
+            self._records = util.LRUCache(self.record_cache_size,
+                                          self.record_cache_ttl)
+        else:
+            self._records = None
+        executor = self.executor
+        if executor is None:
+            self._submit = None
+        elif _process_pool(executor):
+            raise TypeError('the executor of a Schema must run threads, '
+                            'not processes: %r' % (executor,))
+        elif hasattr(executor, 'apply_async'):
+            self._submit = executor.apply_async
+        else:
+            self._submit = util.future_submitter(executor)
+
+    def _param_names(self):
+        return ('subvalidators',
+                'msg',
+                'allow_missing',
+                'allow_extra',
+                'filter_extra',
+                'codegen',
+                'fail_fast',
+                'cache_size',
+                'cache_ttl',
+                'record_cache_size',
+                'record_cache_ttl',
+                'context_keys',
+                'observer',
+                'executor')
+
+    def _get_subvalidators(self):
+        return self._subvalidators
+
+    def _set_subvalidators(self, subvalidators):
+        self._subvalidators = subvalidators
+        self.invalidate()
+
+    subvalidators = property(_get_subvalidators, _set_subvalidators)
+
+    def compile(self):
+        """
+        builds (if necessary) and returns the execution plan for the
+        current subvalidators.
+        """
+        if self._plan is None:
+            self._plan = _SchemaPlan(self._subvalidators,
+                                     self.codegen,
+                                     self.cache_size,
+                                     self.cache_ttl)
+        return self._plan
+
+    def cache_info(self):
+        """
+        returns a CacheInfo of the total hits, misses, maximum and
+        current size of the caches of the pure subvalidators (see
+        cache_size).
+        """
+        hits = misses = currsize = 0
+        maxsize = 0
+        for cache in self.compile().caches:
+            info = cache.cache_info()
+            hits += info.hits
+            misses += info.misses
+            currsize += info.currsize
+            if maxsize is not None:
+                if info.maxsize is None:
+                    maxsize = None
+                else:
+                    maxsize += info.maxsize
+        return util.CacheInfo(hits, misses, maxsize, currsize)
+
+    def record_cache_info(self):
+        """
+        returns a CacheInfo of the hits, misses, maximum and current
+        size of the record cache, or None if there is none (see
+        record_cache_size).
+        """
+        if self._records is not None:
+            return self._records.info()
+
+    def invalidate(self):
+        """
+        discards the compiled execution plan, so that changes made to
+        the subvalidators in place are picked up by the next call,
+        and empties the record cache (see record_cache_size).
+        """
+        self._plan = None
+        records = getattr(self, '_records', None)
+        if records is not None:
+            records.clear()
 
     def _keys(self):
-        schemakeys = set()
-        for x in self.subvalidators:
-            if isinstance(x, (list, tuple)):
-                for x1 in x:
-                    schemakeys.add(x1)
+        return set(self.compile().keys)
+
+    @property
+    def io_bound(self):
+        return bool(self.compile().io_keys)
+
+    def _run_steps(self, steps, data, result, context, exceptions, fail_fast,
+                   pending=None, todo=None, by_key=False):
+        """
+        runs steps (or, if todo is given, those at the indices in todo,
+        in that order), putting the converted values in result and the
+        failures in exceptions, under the field names they give or, if
+        by_key is true, under the schema keys.  pending maps the keys of
+        the steps already running in other threads to their Calls,
+        whose outcomes are taken instead.
+        """
+        if todo is not None:
+            steps = [steps[i] for i in todo]
+        failed = None
+        for k, have_plural, vfunc, apply in steps:
+            if have_plural:
+                if failed and not failed.isdisjoint(k):
+                    continue
+                tmp = apply(tuple(result.get(x, data.get(x)) for x in k),
+                            context)
+            elif pending and k in pending:
+                tmp = pending[k].get()
+            else:
+                tmp = apply(result.get(k, data.get(k)), context)
+            if type(tmp) is _Failure:
+                # if the error specifies a field name,
+                # let that override the key in the validator
+                # dictionary.  The error itself is only unpacked
+                # if and when it is needed.
+                if by_key:
+                    exceptions[k] = tmp
+                else:
+                    exceptions[tmp.name(k)] = tmp
+                if fail_fast:
+                    return
+                if failed is None:
+                    failed = set()
+                if have_plural:
+                    failed.update(k)
+                else:
+                    failed.add(k)
             else:
-                schemakeys.add(x)
-        return schemakeys
+                if have_plural:
+                    result.update(zip(k, tmp))
+                else:
+                    result[k] = tmp
 
-    def __call__(self, data, context=None):
+    def _context(self, context):
+        """
+        returns a tuple of the context to pass to the subvalidators
+        and whether to stop at the first error.
+        """
         if not context:
             context = dict()
+        if self.fail_fast:
+            if isinstance(context, dict) and not context.get(FAIL_FAST):
+                context = dict(context)
+                context[FAIL_FAST] = True
+            return context, True
+        return context, _fail_fast(context)
+
+    def _check_keys(self, plan, data, missing=True):
+        """
+        raises Invalid if data has extra or missing keys the schema
+        does not allow.  Missing keys are only looked for if missing
+        is true.
+        """
+        if not (self.allow_extra and self.allow_missing):
+            schemakeys = plan.keys
+            if not self.allow_extra:
+                for k in data:
+                    if k not in schemakeys:
+                        m = _msg(self.msg, 'schema.extra', 'extra keys in input')
+                        raise Invalid(m)
+            if missing and not self.allow_missing:
+                for k in schemakeys:
+                    if k not in data:
+                        m = _msg(self.msg, 'schema.missing', 'missing keys in input')
+                        raise Invalid(m)
+
+    def _record_key(self, data, context):
+        """
+        returns the key of data and context in the record cache, or
+        None if they cannot be hashed.
+        """
+        if isinstance(context, dict):
+            # asking for fail_fast changes the errors
+            context = (tuple(context.get(k) for k in self.context_keys),
+                       _fail_fast(context))
+        try:
+            key = (util.freeze(data, True), util.freeze(context, True))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _validate(self, data, context, submit=None):
+        """
+        validates data, returning a tuple of the converted data and a
+        dictionary of errors (including the schema's own message),
+        which is empty if there were none.  The field errors are left
+        for Invalid to unpack.  Missing or extra keys still raise
+        Invalid.  submit is passed on to _run().
+        """
+        records = self._records
+        if records is None:
+            return self._run(data, context, submit)
+        key = self._record_key(data, context)
+        if key is None:
+            return self._run(data, context, submit)
+        entry = records.get(key, _default)
+        if entry is _default:
+            try:
+                result, exceptions = self._run(data, context, submit)
+            except Invalid, e:
+                records.put(key, _copy_invalid(e))
+                raise
+            # neither the caller nor later hits may share the result,
+            # down to its nested values
+            records.put(key, (copy.deepcopy(result), exceptions))
+            # Invalid replaces the failures in the dictionary it is given
+            return result, dict(exceptions)
+        elif isinstance(entry, Invalid):
+            raise _copy_invalid(entry)
+        result, exceptions = entry
+        result = copy.deepcopy(result)
+        if not self.filter_extra:
+            data.update(result)
+            result = data
+        # Invalid replaces the failures in the dictionary it is given
+        return result, dict(exceptions)
+
+    def _run(self, data, context, submit=None):
+        """
+        does the work of _validate(), without the record cache.  If
+        submit (by default, that of the executor) is given, the
+        I/O-bound steps are started first, each with submit(apply,
+        (value, context)), which returns an object whose get() method
+        waits for the result.
+        """
+        if submit is None:
+            submit = self._submit
+        plan = self._plan
+        if plan is None:
+            plan = self.compile()
+        context, fail_fast = self._context(context)
         if not self.filter_extra:
             result = data
         else:
             result = {}
         exceptions = {}
-        if not (self.allow_extra and self.allow_missing):
-            inputkeys = set(data.keys())
-            schemakeys = self._keys()
-            if not self.allow_extra:
-                if inputkeys.difference(schemakeys):
-                    m = _msg(self.msg, 'schema.extra', 'extra keys in input')
-                    raise Invalid(m)
-            if not self.allow_missing:
-                if schemakeys.difference(inputkeys):
-                    m = _msg(self.msg, 'schema.missing', 'missing keys in input')
-                    raise Invalid(m)
-
-        for k in sorted(self.subvalidators):
-            vfunc = self.subvalidators[k]
-            if isinstance(vfunc, (list, tuple)):
-                vfunc = all_of(*vfunc)
-            have_plural = isinstance(k, (list,tuple))
-            if have_plural:
-                vdata = tuple(result.get(x, data.get(x)) for x in k)
-            else:
-                vdata = result.get(k, data.get(k))
-            try:
-                tmp = vfunc(vdata, context)
-            except Invalid, e:
-                # if the exception specifies a field name,
-                # let that override the key in the validator
-                # dictionary
-                name = getattr(e, 'field', k)
-                exceptions[name] = e._unpack_errors()
-            else:
-                if have_plural:
-                    result.update(dict(zip(k, tmp)))
-                else:
-                    result[k] = tmp
+        self._check_keys(plan, data)
+
+        observer = self._current_observer()
+        steps = plan.steps_for(observer)
+        if submit is not None and plan.io_keys:
+            io_keys = plan.io_keys
+            pending = {}
+            for k, have_plural, vfunc, apply in steps:
+                if not have_plural and k in io_keys:
+                    pending[k] = submit(apply, (data.get(k), context))
+            self._run_steps(steps, data, result, context, exceptions,
+                            fail_fast, pending)
+        elif observer is None and plan.function is not None:
+            plan.function(data, result, context, exceptions, fail_fast)
+        else:
+            self._run_steps(steps, data, result, context, exceptions,
+                            fail_fast)
 
         if exceptions:
-            if not exceptions.has_key(None):
-                m = _msg(self.msg, "schema.error",
-                         "Problems were found in the submitted data.")
-                exceptions[None] = m
+            self._add_message(exceptions)
+        return result, exceptions
+
+    def _current_observer(self):
+        """
+        returns the observer of the schema, or else the one installed
+        by validino.instrument(), or None.
+        """
+        if self.observer is not None:
+            return self.observer
+        return _observer
+
+    def _add_message(self, exceptions):
+        if not exceptions.has_key(None):
+            m = _msg(self.msg, "schema.error",
+                     "Problems were found in the submitted data.")
+            exceptions[None] = m
+
+    def _apply(self, data, context):
+        try:
+            result, exceptions = self._validate(data, context)
+        except Invalid, e:
+            return _Failure(exception=e)
+        if exceptions:
+            return _Failure(exceptions)
+        return result
+
+    def validate_concurrent(self, data, context=None, limit=None):
+        """
+        validates data as calling the schema does, returning the
+        converted data or raising the same Invalid, but runs the
+        I/O-bound subvalidators of singular keys (see
+        Validator.io_bound) each in a thread of its own, at most
+        limit of them at a time, while the other subvalidators run in
+        this thread.  The latency of several slow lookups is then that
+        of the slowest rather than their sum.
+
+        The subvalidators of plural keys still run after all those of
+        the singular keys.  With fail_fast, the lookups already started
+        are not waited for after the first error.
+        """
+        result, exceptions = self._validate(data, context,
+                                            util.threaded(limit))
+        if exceptions:
             raise Invalid(exceptions)
         return result
 
+    def validate_many(self, iterable, context=None, compact=False):
+        """
+        validates each of the dictionaries in iterable, yielding a
+        tuple of (index, result, errors) for each of them in turn.
+        For valid input, errors is None; otherwise result is None and
+        errors is what unpack_errors() would have returned for the
+        Invalid that calling the schema raises -- or, if compact is
+        true, what compact_errors() would have returned.
+
+        No exceptions are raised for invalid input, and the input is
+        consumed lazily, so any number of records can be streamed
+        through.
+        """
+        # the compact errors are shared within the batch
+        table = {}
+        for index, data in enumerate(iterable):
+            result, errors = self._outcome(data, context, compact, table)
+            yield index, result, errors
+
+    def _outcome(self, data, context, compact, table=None):
+        """
+        returns the (result, errors) pair validate_many() yields for
+        data, interning compact errors in table.
+        """
+        try:
+            result, errors = self._validate(data, context)
+        except Invalid, e:
+            pass
+        else:
+            if not errors:
+                return result, None
+            e = Invalid(errors)
+        if compact:
+            return None, e.compact_errors(table)
+        return None, e.unpack_errors()
+
+    def validate_stream(self, iterable, context=None, concurrency=8,
+                        ordered=True, compact=False):
+        """
+        validates the dictionaries in iterable as validate_many()
+        does, but concurrency of them at a time, each in one of as
+        many threads, so that records waiting on I/O-bound
+        subvalidators (see Validator.io_bound) do not hold up the
+        others.  The (index, result, errors) tuples are yielded in the
+        order of the input if ordered is true, or else as soon as each
+        record is done.
+
+        No more than concurrency records are taken from iterable
+        before their tuples have been yielded, so a slow consumer
+        holds back a fast source instead of letting records pile up
+        in memory.  The records share the schema's caches.  An
+        exception other than Invalid raised while validating a record
+        is raised here, and the threads are stopped once the
+        generator is exhausted or closed.  A concurrency below 1
+        raises ValueError.
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1, not %r'
+                             % (concurrency,))
+        return self._stream(iterable, context, concurrency, ordered,
+                            compact)
+
+    def _stream(self, iterable, context, concurrency, ordered, compact):
+        tasks = Queue.Queue()
+        done = Queue.Queue()
+        table = {}
+
+        def work():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    return
+                index, data = task
+                try:
+                    outcome = self._outcome(data, context, compact, table)
+                except:
+                    done.put((index, False, sys.exc_info()))
+                else:
+                    done.put((index, True, outcome))
+
+        threads = []
+        for i in range(concurrency):
+            t = threading.Thread(target=work)
+            t.daemon = True
+            t.start()
+            threads.append(t)
+        records = enumerate(iterable)
+        # the records taken and not yielded yet, and those of them
+        # which are done but wait for earlier ones to be yielded
+        in_flight = 0
+        waiting = {}
+        next_index = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and in_flight < concurrency:
+                    try:
+                        tasks.put(records.next())
+                    except StopIteration:
+                        exhausted = True
+                    else:
+                        in_flight += 1
+                if not in_flight:
+                    return
+                index, ok, outcome = done.get()
+                if not ok:
+                    raise outcome[0], outcome[1], outcome[2]
+                if not ordered:
+                    in_flight -= 1
+                    yield index, outcome[0], outcome[1]
+                    continue
+                waiting[index] = outcome
+                while next_index in waiting:
+                    result, errors = waiting.pop(next_index)
+                    in_flight -= 1
+                    yield next_index, result, errors
+                    next_index += 1
+        finally:
+            for t in threads:
+                tasks.put(None)
+
+    def validate_partial(self, data, context=None):
+        """
+        validates only the fields present in data, as for a partial
+        update, returning the converted values of those fields or
+        raising Invalid.
+
+        Only the subvalidators of the singular keys in data, and of
+        the plural keys all of whose fields are in data, are run, so
+        the cost follows the size of data rather than that of the
+        schema.  Missing keys are never an error; extra keys still
+        are if allow_extra is False.  The generated field loop (see
+        codegen) is not used.
+        """
+        plan = self._plan
+        if plan is None:
+            plan = self.compile()
+        context, fail_fast = self._context(context)
+        self._check_keys(plan, data, missing=False)
+        index = plan.index
+        todo = set()
+        for k in data:
+            if k in index:
+                todo.add(index[k])
+            for pk in plan.dependents.get(k, ()):
+                for x in pk:
+                    if x not in data:
+                        break
+                else:
+                    todo.add(index[pk])
+        if not self.filter_extra:
+            result = data
+        else:
+            result = {}
+        exceptions = {}
+        steps = plan.steps_for(self._current_observer())
+        self._run_steps(steps, data, result, context, exceptions,
+                        fail_fast, todo=sorted(todo))
+        if exceptions:
+            self._add_message(exceptions)
+            raise Invalid(exceptions)
+        return result
 
-def confirm_type(typespec, msg=None):
-    @functools.wraps(confirm_type)
-    def f(value, context=None):
-        if isinstance(value, typespec):
+    def revalidate(self, previous_result, new_data, changed_keys=None,
+                   context=None):
+        """
+        validates new_data incrementally, returning a SchemaState.
+
+        previous_result is the SchemaState returned for an earlier
+        version of the data, or None, in which case all of new_data is
+        validated.  Only the subvalidators of the fields that changed
+        are run again, together with those of every plural key that
+        mentions one of them (and of the fields those plural keys
+        mention, since they may have converted them); everything else
+        is taken from previous_result.  The fields that changed are
+        found by comparing new_data with previous_result.data, unless
+        changed_keys, an iterable of field names, is given -- which is
+        needed if the values were mutated in place, and saves looking
+        at every field.
+
+        Missing or extra keys raise Invalid, as they do when the
+        schema is called.  The whole of new_data is validated again if
+        the schema has been recompiled since previous_result, or if
+        validation should stop at the first error (see fail_fast).
+        The generated field loop (see codegen) is not used.
+        """
+        plan = self._plan
+        if plan is None:
+            plan = self.compile()
+        context, fail_fast = self._context(context)
+        self._check_keys(plan, new_data)
+        data = dict(new_data)
+        if (previous_result is None
+            or previous_result.plan is not plan
+            or fail_fast):
+            if self.filter_extra:
+                result = {}
+            else:
+                result = new_data
+            failures = {}
+            todo = None
+        else:
+            if changed_keys is None:
+                old = previous_result.data
+                changed = [k for k in plan.keys
+                           if old.get(k, _default) != new_data.get(k, _default)]
+            else:
+                changed = changed_keys
+            # follow the plural keys from the changed fields to
+            # every field and key whose value they may affect
+            dirty = set()
+            todo = set()
+            pending = list(changed)
+            while pending:
+                k = pending.pop()
+                if k in dirty:
+                    continue
+                dirty.add(k)
+                if k in plan.index:
+                    todo.add(plan.index[k])
+                for pk in plan.dependents.get(k, ()):
+                    i = plan.index[pk]
+                    if i not in todo:
+                        todo.add(i)
+                        pending.extend(pk)
+            todo = sorted(todo)
+            if self.filter_extra:
+                result = dict(previous_result.result)
+                for k in dirty:
+                    result.pop(k, None)
+            else:
+                result = new_data
+                for k, v in previous_result.result.iteritems():
+                    if k in plan.keys and k not in dirty:
+                        result[k] = v
+            failures = dict((k, f) for k, f
+                            in previous_result.failures.iteritems()
+                            if plan.index[k] not in todo)
+
+        steps = plan.steps_for(self._current_observer())
+        self._run_steps(steps, new_data, result, context, failures,
+                        fail_fast, todo=todo, by_key=True)
+        return SchemaState(self, plan, data, result, failures)
+
+
+class SchemaState(object):
+    """
+    the outcome of Schema.revalidate(), to be passed back to it with
+    the next version of the data.
+
+    data is a (shallow) copy of the data that was validated, and
+    result the converted values, which are incomplete if errors is not
+    None.  errors is None for valid data, and otherwise what
+    unpack_errors() would return for the Invalid that calling the
+    schema would have raised.
+    """
+    __slots__ = ('schema', 'plan', 'data', 'result', 'failures')
+
+    def __init__(self, schema, plan, data, result, failures):
+        self.schema = schema
+        self.plan = plan
+        self.data = data
+        self.result = result
+        # the failed steps, by schema key
+        self.failures = failures
+
+    @property
+    def valid(self):
+        return not self.failures
+
+    @property
+    def errors(self):
+        if not self.failures:
+            return None
+        exceptions = {}
+        # in step order, so that the errors for a field are
+        # overridden as they would be when calling the schema
+        for k in sorted(self.failures, key=self.plan.index.__getitem__):
+            f = self.failures[k]
+            exceptions[f.name(k)] = f
+        self.schema._add_message(exceptions)
+        return Invalid(exceptions).unpack_errors()
+
+    def invalid(self):
+        """
+        returns the Invalid that calling the schema would have raised,
+        or None if the data was valid.
+        """
+        errors = self.errors
+        if errors is not None:
+            return Invalid(errors)
+
+
+class confirm_type(Validator):
+    __slots__ = ('typespec', 'msg')
+
+    def __init__(self, typespec, msg=None):
+        self.typespec = typespec
+        self.msg = msg
+
+    def _apply(self, value, context):
+        if isinstance(value, self.typespec):
             return value
-        raise Invalid(_msg(msg, "confirm_type", "unexpected type"))
-    return f
+        return _Failure(_msg(self.msg, "confirm_type", "unexpected type"))
+
 
+class translate(Validator):
+    __slots__ = ('mapping', 'msg')
 
-def translate(mapping, msg=None):
-    @functools.wraps(translate)
-    def f(value, context=None):
+    pure = True
+
+    def __init__(self, mapping, msg=None):
+        self.mapping = mapping
+        self.msg = msg
+
+    def _apply(self, value, context):
         try:
-            return mapping[value]
+            return self.mapping[value]
         except KeyError:
-            raise Invalid(_msg(msg, "belongs", "invalid choice"))
-    return f
+            return _Failure(_msg(self.msg, "belongs", "invalid choice"))
+
 
+class is_unicode(Validator):
+    __slots__ = ('msg',)
 
-def is_unicode(msg=None):
-    @functools.wraps(is_unicode)
-    def f(value, context=None):
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def _apply(self, value, context):
         if isinstance(value, unicode):
             return value
         else:
-            raise Invalid(_msg(msg, 'is_unicode', 'not unicode'))
-    return f
+            return _Failure(_msg(self.msg, 'is_unicode', 'not unicode'))
+
 
+class to_unicode(Validator):
+    __slots__ = ('encoding', 'errors', 'msg')
 
-def to_unicode(encoding='utf8', errors='strict', msg=None):
-    @functools.wraps(to_unicode)
-    def f(value, context=None):
+    def __init__(self, encoding='utf8', errors='strict', msg=None):
+        self.encoding = encoding
+        self.errors = errors
+        self.msg = msg
+
+    def _apply(self, value, context):
         if isinstance(value, unicode):
             return value
         elif value is None:
             return u''
         else:
             try:
-                return value.decode(encoding, errors)
+                return value.decode(self.encoding, self.errors)
             except AttributeError:
                 return unicode(value)
             except UnicodeError, e:
-                raise Invalid(_msg(msg, 'to_unicode', 'encoding error'))
-    return f
+                return _Failure(_msg(self.msg, 'to_unicode', 'encoding error'))
+
 
+class is_string(Validator):
+    __slots__ = ('msg',)
 
-def is_string(msg=None):
-    @functools.wraps(is_string)
-    def f(value, context=None):
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def _apply(self, value, context):
         if isinstance(value, str):
             return value
         else:
-            raise Invalid(_msg(msg, 'is_string', 'not string'))
-    return f
+            return _Failure(_msg(self.msg, 'is_string', 'not string'))
+
 
+class to_string(Validator):
+    __slots__ = ('encoding', 'errors', 'coerce', 'msg')
 
-def to_string(encoding='utf8', errors='strict', coerce=True, msg=None):
-    @functools.wraps(to_string)
-    def f(value, context=None):
+    def __init__(self, encoding='utf8', errors='strict', coerce=True, msg=None):
+        self.encoding = encoding
+        self.errors = errors
+        self.coerce = coerce
+        self.msg = msg
+
+    def _apply(self, value, context):
         if isinstance(value, str):
             return value
-        elif not coerce:
-            raise Invalid(_msg(msg, 'to_string', 'encoding error'))
+        elif not self.coerce:
+            return _Failure(_msg(self.msg, 'to_string', 'encoding error'))
         elif value is None:
             return ''
         else:
             try:
-                return value.encode(encoding, errors)
+                return value.encode(self.encoding, self.errors)
             except AttributeError:
                 return str(value)
             except UnicodeError, e:
-                raise Invalid(_msg(msg, 'to_string', 'encoding error'))
-    return f
+                return _Failure(_msg(self.msg, 'to_string', 'encoding error'))
 
 
-def is_scalar(msg=None, listtypes=(list,)):
+class is_scalar(Validator):
     """
     Raises an exception if the value is not a scalar.
     """
-    @functools.wraps(is_scalar)
-    def f(value, context=None):
-        if isinstance(value, listtypes):
-            raise Invalid(_msg(msg, 'is_scalar', 'expected scalar value'))
+    __slots__ = ('msg', 'listtypes')
+
+    def __init__(self, msg=None, listtypes=(list,)):
+        self.msg = msg
+        self.listtypes = listtypes
+
+    def _apply(self, value, context):
+        if isinstance(value, self.listtypes):
+            return _Failure(_msg(self.msg, 'is_scalar', 'expected scalar value'))
         return value
-    return f
 
 
-def is_list(msg=None, listtypes=(list,)):
+class is_list(Validator):
     """
     Raises an exception if the value is not a list.
     """
-    @functools.wraps(is_list)
-    def f(value, context=None):
-        if not isinstance(value, listtypes):
-            raise Invalid(_msg(msg, "is_list", "expected list value"))
+    __slots__ = ('msg', 'listtypes')
+
+    def __init__(self, msg=None, listtypes=(list,)):
+        self.msg = msg
+        self.listtypes = listtypes
+
+    def _apply(self, value, context):
+        if not isinstance(value, self.listtypes):
+            return _Failure(_msg(self.msg, "is_list", "expected list value"))
         return value
-    return f
 
 
-def to_scalar(listtypes=(list,)):
+class to_scalar(Validator):
     """
     if the value is a list, return the first element.
     Otherwise, return the value.
 
     This raises no exceptions.
     """
-    @functools.wraps(to_scalar)
-    def f(value, context=None):
-        if isinstance(value, listtypes):
+    __slots__ = ('listtypes',)
+
+    def __init__(self, listtypes=(list,)):
+        self.listtypes = listtypes
+
+    def _apply(self, value, context):
+        if isinstance(value, self.listtypes):
             return value[0]
         return value
-    return f
 
 
-def to_list(listtypes=(list,)):
+class to_list(Validator):
     """
     if the value is a scalar, wrap it in a list.
     Otherwise, return the value.
 
     This raises no exceptions.
     """
-    @functools.wraps(to_list)
-    def f(value, context=None):
-        if not isinstance(value, listtypes):
+    __slots__ = ('listtypes',)
+
+    def __init__(self, listtypes=(list,)):
+        self.listtypes = listtypes
+
+    def _apply(self, value, context):
+        if not isinstance(value, self.listtypes):
             return [value]
         return value
-    return f
 
 
-def default(defaultValue):
+class default(Validator):
     """
     if the value is None, return defaultValue instead.
 
     This raises no exceptions.
     """
-    @functools.wraps(default)
-    def f(value, context=None):
+    __slots__ = ('defaultValue',)
+
+    def __init__(self, defaultValue):
+        self.defaultValue = defaultValue
+
+    def _apply(self, value, context):
         if value is None:
-            return defaultValue
+            return self.defaultValue
         return value
-    return f
 
 
-def all_of(*validators):
+class memoize(Validator):
+    """
+    caches the results of validator, which should be pure (see
+    Validator.pure), for each value, in a thread-safe LRU cache of at
+    most maxsize entries (or any number, if maxsize is None), which
+    expire after ttl seconds if ttl is given.  Failures are cached
+    too, and each hit raises a fresh Invalid with its own copy of the
+    errors.  Unhashable values are passed to validator every time.
+
+    >>> validator = memoize(parse_date('%Y-%m-%d'), maxsize=100)
+    >>> validator('2007-01-02')
+    datetime.date(2007, 1, 2)
+    >>> validator('2007-01-02')
+    datetime.date(2007, 1, 2)
+    >>> validator.cache_info()
+    CacheInfo(hits=1, misses=1, maxsize=100, currsize=1)
+    """
+    __slots__ = ('validator', 'maxsize', 'ttl', '_cache', '_applier')
+
+    io_bound = property(lambda self: getattr(self.validator, 'io_bound',
+                                             False))
+
+    def __init__(self, validator, maxsize=1024, ttl=None):
+        self.validator = validator
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._setup()
+
+    def _setup(self):
+        self._cache = util.LRUCache(self.maxsize, self.ttl)
+        self._applier = _applier(self.validator)
+
+    def _apply(self, value, context):
+        # values that are equal but of different types, such as 1 and
+        # 1.0, may well give different results
+        key = (type(value), value)
+        try:
+            result = self._cache.get(key, _default)
+        except TypeError:
+            return self._applier(value, context)
+        if result is _default:
+            result = self._applier(value, context)
+            if type(result) is _Failure:
+                # keep a copy that callers cannot get hold of
+                self._cache.put(key, _Failure(
+                    exception=_copy_invalid(result.invalid())))
+            else:
+                self._cache.put(key, result)
+        elif type(result) is _Failure:
+            result = _Failure(exception=_copy_invalid(result.exception))
+        return result
+
+    def cache_info(self):
+        """
+        returns a CacheInfo of the hits, misses, maximum and current
+        size of the cache.
+        """
+        return self._cache.info()
+
+    def cache_clear(self):
+        self._cache.clear()
+
+
+def _memoized(vfunc, maxsize, ttl, caches):
+    """
+    internal: wraps vfunc, or the validators in a list or tuple of
+    them, in memoize() if it is pure, appending the memoize instances
+    to caches.
+    """
+    if isinstance(vfunc, (list, tuple)):
+        return type(vfunc)(_memoized(v, maxsize, ttl, caches) for v in vfunc)
+    if getattr(vfunc, 'pure', False):
+        vfunc = memoize(vfunc, maxsize, ttl)
+        caches.append(vfunc)
+    return vfunc
+
+
+class all_of(Validator):
     """
     Applies each of a series of validators in turn, passing the return
     value of each to the next.
     """
-    @functools.wraps(all_of)
-    def f(value, context=None):
-        for v in validators:
-            value = v(value, context=context)
+    __slots__ = ('validators', '_appliers')
+
+    io_bound = property(lambda self: _io_bound(self.validators))
+
+    def __init__(self, *validators):
+        self.validators = validators
+        self._setup()
+
+    def _setup(self):
+        self._appliers = tuple(_applier(v) for v in self.validators)
+
+    def _apply(self, value, context):
+        for apply in self._appliers:
+            value = apply(value, context)
+            if type(value) is _Failure:
+                break
         return value
-    return f
 
 
-def either(*validators):
+class either(Validator):
     """
     Tries each of a series of validators in turn, swallowing any
     exceptions they raise, and returns the result of the first one
     that works.  If none work, the last exception caught is re-raised.
     """
-    @functools.wraps(either)
-    def f(value, context=None):
+    __slots__ = ('validators', '_appliers')
+
+    io_bound = property(lambda self: _io_bound(self.validators))
+
+    def __init__(self, *validators):
+        self.validators = validators
+        self._setup()
+
+    def _setup(self):
+        self._appliers = tuple(_applier(v) for v in self.validators)
+
+    def _apply(self, value, context):
         last_exception = None
-        for v in validators:
+        for apply in self._appliers:
             try:
-                value = v(value, context=context)
+                result = apply(value, context)
             except Exception, e:
                 last_exception = e
             else:
-                return value
+                if type(result) is not _Failure:
+                    return result
+                last_exception = result
+        if type(last_exception) is _Failure:
+            return last_exception
         raise last_exception
-    return f
 
 
-def check(*validators):
+class check(Validator):
     """
     Returns a function that runs each of a series of validators
     against input data, which is passed to each validator in turn,
     ignoring the validators return value.  The function returns the
     original input data (which, if it mutable, may have been changed).
     """
-    @functools.wraps(check)
-    def f(value, context=None):
-        for v in validators:
-            v(value, context=context)
+    __slots__ = ('validators', '_appliers')
+
+    io_bound = property(lambda self: _io_bound(self.validators))
+
+    def __init__(self, *validators):
+        self.validators = validators
+        self._setup()
+
+    def _setup(self):
+        self._appliers = tuple(_applier(v) for v in self.validators)
+
+    def _apply(self, value, context):
+        for apply in self._appliers:
+            result = apply(value, context)
+            if type(result) is _Failure:
+                return result
         return value
-    return f
 
 
-def excursion(*validators):
+class excursion(Validator):
     """
     Perform a series of validations that may break down the data
     passed in into a form that you don't deserve to retain; if the
     data survives validation, you get a copy of the data from the
     point the excursion started.
     """
-    @functools.wraps(excursion)
-    def f(value, context=None):
+    __slots__ = ('validators', '_composed')
+
+    def __init__(self, *validators):
+        self.validators = validators
+        self._setup()
+
+    def _setup(self):
+        self._composed = all_of(*self.validators)
+
+    def _apply(self, value, context):
         return_value = copy.copy(value)
-        all_of(*validators)(value)
+        result = self._composed._apply(value, None)
+        if type(result) is _Failure:
+            return result
         return return_value
-    return f
 
 
-def equal(val, msg=None):
-    @functools.wraps(equal)
-    def f(value, context=None):
-        if value == val:
+class equal(Validator):
+    __slots__ = ('val', 'msg')
+
+    def __init__(self, val, msg=None):
+        self.val = val
+        self.msg = msg
+
+    def _apply(self, value, context):
+        if value == self.val:
             return value
-        raise Invalid(_msg(msg, 'eq', 'invalid value'))
-    return f
+        return _Failure(_msg(self.msg, 'eq', 'invalid value'))
 
 
-def not_equal(val, msg=None):
-    @functools.wraps(not_equal)
-    def f(value, context=None):
-        if value != val:
+class not_equal(Validator):
+    __slots__ = ('val', 'msg')
+
+    def __init__(self, val, msg=None):
+        self.val = val
+        self.msg = msg
+
+    def _apply(self, value, context):
+        if value != self.val:
             return value
-        raise Invalid(_msg(msg, 'eq', 'invalid value'))
-    return f
+        return _Failure(_msg(self.msg, 'eq', 'invalid value'))
+
+
+class empty(Validator):
+    __slots__ = ('msg',)
 
+    def __init__(self, msg=None):
+        self.msg = msg
 
-def empty(msg=None):
-    @functools.wraps(empty)
-    def f(value, context=None):
+    def _apply(self, value, context):
         if value == '' or value is None:
             return value
-        raise Invalid(_msg(msg, "empty", "No value was expected"))
-    return f
+        return _Failure(_msg(self.msg, "empty", "No value was expected"))
+
 
+class not_empty(Validator):
+    __slots__ = ('msg',)
 
-def not_empty(msg=None):
-    @functools.wraps(not_empty)
-    def f(value, context=None):
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def _apply(self, value, context):
         if value != '' and value != None:
             return value
-        raise Invalid(_msg(msg, 'notempty', "A non-empty value was expected"))
-    return f
+        return _Failure(_msg(self.msg, 'notempty', "A non-empty value was expected"))
 
 
 def strip(value, context=None):
@@ -520,118 +1812,153 @@ def strip(value, context=None):
         return value
 
 
-def clamp(min=None, max=None, msg=None):
+class clamp(Validator):
     """
     clamp a value between minimum and maximum values (either
     of which are optional).
     """
-    @functools.wraps(clamp)
-    def f(value, context=None):
-        if min is not None and value < min:
-            raise Invalid(_msg(msg, "min", "value below minimum"))
-        if max is not None and value > max:
-            raise Invalid(_msg(msg, "max", "value above maximum"))
+    __slots__ = ('min', 'max', 'msg')
+
+    def __init__(self, min=None, max=None, msg=None):
+        self.min = min
+        self.max = max
+        self.msg = msg
+
+    def _apply(self, value, context):
+        if self.min is not None and value < self.min:
+            return _Failure(_msg(self.msg, "min", "value below minimum"))
+        if self.max is not None and value > self.max:
+            return _Failure(_msg(self.msg, "max", "value above maximum"))
         return value
-    return f
 
 
-def clamp_length(min=None, max=None, msg=None):
+class clamp_length(Validator):
     """
     clamp a value between minimum and maximum lengths (either
     of which are optional).
     """
-    @functools.wraps(clamp_length)
-    def f(value, context=None):
+    __slots__ = ('min', 'max', 'msg')
+
+    def __init__(self, min=None, max=None, msg=None):
+        self.min = min
+        self.max = max
+        self.msg = msg
+
+    def _apply(self, value, context):
         vlen = len(value)
-        if min is not None and vlen < min:
-            raise Invalid(_msg(msg, "minlen", "too short"))
-        if max is not None and vlen > max:
-            raise Invalid(_msg(msg, "maxlen", "too long"))
+        if self.min is not None and vlen < self.min:
+            return _Failure(_msg(self.msg, "minlen", "too short"))
+        if self.max is not None and vlen > self.max:
+            return _Failure(_msg(self.msg, "maxlen", "too long"))
         return value
-    return f
 
 
-def belongs(domain, msg=None):
+class belongs(Validator):
     """
     ensures that the value belongs to the domain
     specified.
     """
-    @functools.wraps(belongs)
-    def f(value, context=None):
-        if value in domain:
+    __slots__ = ('domain', 'msg')
+
+    def __init__(self, domain, msg=None):
+        self.domain = domain
+        self.msg = msg
+
+    def _apply(self, value, context):
+        if value in self.domain:
             return value
-        raise Invalid(_msg(msg, "belongs", "invalid choice"))
-    return f
+        return _Failure(_msg(self.msg, "belongs", "invalid choice"))
 
 
-def not_belongs(domain, msg=None):
+class not_belongs(Validator):
     """
     ensures that the value does not belong to the domain
     specified.
     """
-    @functools.wraps(not_belongs)
-    def f(value, context=None):
-        if value not in domain:
+    __slots__ = ('domain', 'msg')
+
+    def __init__(self, domain, msg=None):
+        self.domain = domain
+        self.msg = msg
+
+    def _apply(self, value, context):
+        if value not in self.domain:
             return value
-        raise Invalid(_msg(msg, "not_belongs", "invalid choice"))
-    return f
+        return _Failure(_msg(self.msg, "not_belongs", "invalid choice"))
 
 
-def parse_time(format, msg=None):
+class parse_time(Validator):
     """
     attempts to parse the time according to
     the given format, returning a timetuple,
     or raises an Invalid exception.
     """
-    @functools.wraps(parse_time)
-    def f(value, context=None):
+    __slots__ = ('format', 'msg')
+
+    pure = True
+
+    def __init__(self, format, msg=None):
+        self.format = format
+        self.msg = msg
+
+    def _apply(self, value, context):
         try:
-            return time.strptime(value, format)
+            return time.strptime(value, self.format)
         except ValueError:
-            raise Invalid(_msg(msg, 'parse_time', "invalid time"))
-    return f
+            return _Failure(_msg(self.msg, 'parse_time', "invalid time"))
 
 
-def parse_date(format, msg=None):
+class parse_date(parse_time):
     """
     like parse_time, but returns a datetime.date object.
     """
-    @functools.wraps(parse_date)
-    def f(value, context=None):
-        v = parse_time(format, msg)(value)
+    __slots__ = ()
+
+    def _apply(self, value, context):
+        v = parse_time._apply(self, value, context)
+        if type(v) is _Failure:
+            return v
         return datetime.date(*v[:3])
-    return f
 
 
-def parse_datetime(format, msg=None):
+class parse_datetime(parse_time):
     """
     like parse_time, but returns a datetime.datetime object.
     """
-    @functools.wraps(parse_datetime)
-    def f(value, context=None):
-        v = parse_time(format, msg)(value)
+    __slots__ = ()
+
+    def _apply(self, value, context):
+        v = parse_time._apply(self, value, context)
+        if type(v) is _Failure:
+            return v
         return datetime.datetime(*v[:6])
-    return f
 
 
-def uuid(msg=None, default=False):
+class uuid(Validator):
     """
     Accepts any value that can be converted to a uuid
     """
-    @functools.wraps(uuid)
-    def f(value, context=None):
+    __slots__ = ('msg', 'default')
+
+    # a fresh uuid is made for empty values if default is true
+    pure = property(lambda self: not self.default)
+
+    def __init__(self, msg=None, default=False):
+        self.msg = msg
+        self.default = default
+
+    def _apply(self, value, context):
         try:
             v = str(UUID(str(value)))
         except ValueError:
-            if default and not value:
+            if self.default and not value:
                 return uuid1()
             else:
-                raise Invalid(_msg(msg, "uuid", "invalid uuid"))
+                return _Failure(_msg(self.msg, "uuid", "invalid uuid"))
         return v
-    return f
 
 
-def to_integer(msg=None):
+class to_integer(Validator):
     """
     Attempts to coerce the value to an integer.
 
@@ -643,29 +1970,35 @@ def to_integer(msg=None):
     ...
     Invalid: {None: 'me no convert'}
     """
-    @functools.wraps(to_integer)
-    def f(value, context=None):
+    __slots__ = ('msg',)
+
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def _apply(self, value, context):
         try:
             return int(value)
         except (TypeError, ValueError):
-            raise Invalid(_msg(msg, "integer", "not an integer"))
-    return f
+            return _Failure(_msg(self.msg, "integer", "not an integer"))
 
 
-def is_integer(msg=None):
+class is_integer(Validator):
     """
     Tests whether the value in an integer
     """
-    @functools.wraps(is_integer)
-    def f(value, context=None):
+    __slots__ = ('msg',)
+
+    def __init__(self, msg=None):
+        self.msg = msg
+
+    def _apply(self, value, context):
         if isinstance(value, int):
             return value
         else:
-            raise Invalid(_msg(msg, "is_integer", "not an integer"))
-    return f
+            return _Failure(_msg(self.msg, "is_integer", "not an integer"))
 
 
-def to_boolean(msg=None, fuzzy=False):
+class to_boolean(Validator):
     """
     Coerces the value to one of True or False.  If `fuzzy` is `True`
     it checks whether the value is one of a set of reasonable truthy
@@ -679,134 +2012,201 @@ def to_boolean(msg=None, fuzzy=False):
     >>> to_boolean()([])
     False
     """
+    __slots__ = ('msg', 'fuzzy')
+
     true_strings = ['true', 't', 'y', 'yes']
     false_strings = ['false', 'f', 'n', 'no']
-    @functools.wraps(to_boolean)
-    def f(value, context=None):
-        if fuzzy and isinstance(value, basestring):
-            if value.lower() in true_strings:
+
+    def __init__(self, msg=None, fuzzy=False):
+        self.msg = msg
+        self.fuzzy = fuzzy
+
+    def _apply(self, value, context):
+        if self.fuzzy and isinstance(value, basestring):
+            if value.lower() in self.true_strings:
                 return True
-            elif value.lower() in false_strings:
+            elif value.lower() in self.false_strings:
                 return False
         return bool(value)
-    return f
 
 
-def regex(pat, msg=None):
+class regex(Validator):
     """
     tests the value against the given regex pattern
     and raises Invalid if it doesn't match.
     """
-    @functools.wraps(regex)
-    def f(value, context=None):
-        m = re.match(pat, value)
+    __slots__ = ('pat', 'msg')
+
+    pure = True
+
+    def __init__(self, pat, msg=None):
+        self.pat = pat
+        self.msg = msg
+
+    def _apply(self, value, context):
+        m = re.match(self.pat, value)
         if not m:
-            raise Invalid(_msg(msg, 'regex', "does not match pattern"))
+            return _Failure(_msg(self.msg, 'regex', "does not match pattern"))
         return value
-    return f
 
 
-def regex_sub(pat, sub):
+class regex_sub(Validator):
     """
     performs regex substitution on the input value.
     """
-    @functools.wraps(regex_sub)
-    def f(value, context=None):
-        return re.sub(pat, sub, value)
-    return f
+    __slots__ = ('pat', 'sub')
+
+    pure = True
+
+    def __init__(self, pat, sub):
+        self.pat = pat
+        self.sub = sub
 
+    def _apply(self, value, context):
+        return re.sub(self.pat, self.sub, value)
 
-def fields_equal(msg=None, field=_default):
+
+class fields_equal(Validator):
     """
     when passed a collection of values,
     verifies that they are all equal.
     """
-    @functools.wraps(fields_equal)
-    def f(values, context=None):
+    __slots__ = ('msg', 'field')
+
+    def __init__(self, msg=None, field=_default):
+        self.msg = msg
+        self.field = field
+
+    def _apply(self, values, context):
         if len(set(values)) != 1:
-            m = _msg(msg, 'fields_equal', "fields not equal")
-            if field is _default:
-                raise Invalid(m)
+            m = _msg(self.msg, 'fields_equal', "fields not equal")
+            if self.field is _default:
+                return _Failure(m)
             else:
-                raise Invalid(m, field=field)
+                return _Failure(m, field=self.field)
         return values
-    return f
 
 
-def fields_match(name1, name2, msg=None, field=_default):
+class fields_match(Validator):
     """
     verifies that the values associated with the keys 'name1' and
     'name2' in value (which must be a dict) are identical.
     """
-    @functools.wraps(fields_match)
-    def f(value, context=None):
-        if value[name1] != value[name2]:
-            m = _msg(msg, 'fields_match', 'fields do not match')
-            if field is _default:
-                raise Invalid(m)
+    __slots__ = ('name1', 'name2', 'msg', 'field')
+
+    def __init__(self, name1, name2, msg=None, field=_default):
+        self.name1 = name1
+        self.name2 = name2
+        self.msg = msg
+        self.field = field
+
+    def _apply(self, value, context):
+        if value[self.name1] != value[self.name2]:
+            m = _msg(self.msg, 'fields_match', 'fields do not match')
+            if self.field is _default:
+                return _Failure(m)
             else:
-                raise Invalid({field: m})
+                return _Failure({self.field: m})
         return value
-    return f
 
 
-def nested(**kwargs):
+class nested(Validator):
     """
     Behaves like a dict.  It's keys are names, it's values are validators
+
+    If the context asks to fail fast (see Schema), stops at the first
+    key with an error.
     """
-    @functools.wraps(nested)
-    def f(value, context=None):
-        data = dict()
-        errors = dict()
-        for k, v in kwargs.items():
+    __slots__ = ('validators', '_appliers')
+
+    io_bound = property(lambda self: _io_bound(self.validators))
+
+    def __init__(self, **kwargs):
+        self.validators = kwargs
+        self._setup()
+
+    def _setup(self):
+        appliers = []
+        for k, v in self.validators.items():
             if isinstance(v, tuple):
                 v = all_of(*v)
+            appliers.append((k, _applier(v)))
+        self._appliers = tuple(appliers)
+
+    def _apply(self, value, context):
+        data = dict()
+        errors = dict()
+        fail_fast = _fail_fast(context)
+        for k, apply in self._appliers:
             try:
-                data[k] = v(value[k], context=context)
+                result = apply(value[k], context)
             except (KeyError, TypeError):
                 errors[k] = "key %r is missing" % k
-            except Invalid, e:
-                errors[k] = e
+            else:
+                if type(result) is not _Failure:
+                    data[k] = result
+                    continue
+                errors[k] = result.invalid()
+            if fail_fast:
+                break
         if errors:
-            raise Invalid(errors)
+            return _Failure(errors)
         return data
-    return f
 
 
-def nested_many(sub_validator):
+class nested_many(Validator):
     """
     Applies the validator to each of the values
+
+    If the context asks to fail fast (see Schema), stops at the first
+    value with an error.
     """
-    @functools.wraps(nested_many)
-    def f(value, context=None):
+    __slots__ = ('sub_validator', '_applier')
+
+    def __init__(self, sub_validator):
+        self.sub_validator = sub_validator
+        self._setup()
+
+    def _setup(self):
+        self._applier = _applier(self.sub_validator)
+
+    def _apply(self, value, context):
         data = dict()
         errors = dict()
         if value:
+            apply = self._applier
+            fail_fast = _fail_fast(context)
             for k, v in value.items():
-                try:
-                    data[k] = sub_validator(v, context=context)
-                except Invalid, e:
-                    errors[k] = e
+                result = apply(v, context)
+                if type(result) is _Failure:
+                    errors[k] = result.invalid()
+                    if fail_fast:
+                        break
+                else:
+                    data[k] = result
             if errors:
-                raise Invalid(errors)
+                return _Failure(errors)
             else:
                 return data
         else:
-            raise Invalid("No data found")
-    return f
+            return _Failure("No data found")
 
 
-def only_one_of(msg=None, field=None):
+class only_one_of(Validator):
     """
     Check that only one of the given values is True.
     """
-    @functools.wraps(only_one_of)
-    def f(values, context=None):
+    __slots__ = ('msg', 'field')
+
+    def __init__(self, msg=None, field=None):
+        self.msg = msg
+        self.field = field
+
+    def _apply(self, values, context):
         if sum([int(bool(val)) for val in values]) > 1:
-            m = _msg(msg, 'only_one_of', 'more than one value present')
-            if field is not None:
-                raise Invalid(m, field=field)
+            m = _msg(self.msg, 'only_one_of', 'more than one value present')
+            if self.field is not None:
+                return _Failure(m, field=self.field)
             else:
-                raise Invalid(m)
+                return _Failure(m)
         return values
-    return f
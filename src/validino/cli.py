@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+
+"""
+Validates a JSON-lines or CSV file against a Schema, from the command
+line:
+
+    validino-check myapp.forms:signup_schema signups.jsonl \\
+        --valid good.jsonl --errors bad.jsonl --workers 4
+
+(or python -m validino ...).  The file is streamed through the
+schema a record at a time, so memory use does not depend on its size;
+with several workers, a FILE is memory-mapped and split into chunks
+which the workers read and parse themselves (so CSV fields must not
+hold newlines), while standard input is read here and sent to them a
+few records at a time.  The converted valid records are written in
+the format of the input; the invalid ones as JSON lines holding the
+record's line number, the record and its errors as a list of [path,
+message] pairs.  A summary of the throughput and of the most common
+errors is printed to standard error at the end.  The exit status is 1
+if any record was invalid, and 2 if the input could not be read or
+parsed.
+
+With --checkpoint PATH, the progress through FILE is saved to PATH
+every --checkpoint-interval seconds, and a run restarted with the
+same arguments after an interruption resumes from there, writing
+each record to the output files exactly once.
+"""
+
+import csv
+import datetime
+import itertools
+import optparse
+import os
+import sys
+import time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from validino.files import (guess_format, load_checkpoint, read_csv,
+                            read_jsonl, save_checkpoint, validate_chunks,
+                            validate_file)
+from validino.parallel import load_schema, validate_parallel
+from validino.report import ErrorCollector
+
+__all__ = ['main']
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+class JSONLWriter(object):
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, record):
+        self.f.write(json.dumps(record, default=_json_default))
+        self.f.write('\n')
+
+
+class CSVWriter(object):
+    """
+    writes dictionaries as CSV, with the columns of the first one,
+    or the given fieldnames, whose header is then taken to have been
+    written already.
+    """
+
+    def __init__(self, f, fieldnames=None):
+        self.f = f
+        self.writer = None
+        if fieldnames is not None:
+            self.writer = csv.DictWriter(f, fieldnames,
+                                         extrasaction='ignore')
+
+    def write(self, record):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.f, sorted(record),
+                                         extrasaction='ignore')
+            self.writer.writerow(dict((k, k) for k in record))
+        self.writer.writerow(record)
+
+
+def _open(path, mode, default, position=None):
+    if path is None or path == '-':
+        return default
+    if position is None:
+        return open(path, mode)
+    # resuming: drop whatever was written after the checkpoint
+    f = open(path, 'r+b')
+    f.truncate(position)
+    f.seek(position)
+    return f
+
+
+def _sync(*files):
+    for f in files:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _parser():
+    parser = optparse.OptionParser(
+        usage='%prog SCHEMA [FILE]',
+        description='Validates the records of a JSON-lines or CSV FILE '
+        '(or standard input) with the Schema named by the dotted path '
+        'SCHEMA, such as myapp.forms:signup_schema.')
+    parser.add_option('-f', '--format', choices=['jsonl', 'csv'],
+                      help='format of the input: jsonl or csv (by default, '
+                      'csv if FILE ends in .csv, jsonl otherwise)')
+    parser.add_option('--valid', metavar='PATH',
+                      help='where to write the valid records, converted '
+                      '(- for standard output)')
+    parser.add_option('--errors', metavar='PATH',
+                      help='where to write the invalid records and their '
+                      'errors, as JSON lines (- for standard output)')
+    parser.add_option('--context', metavar='JSON',
+                      help='the context to validate with, as JSON')
+    parser.add_option('-w', '--workers', type='int', default=1,
+                      help='number of worker processes [%default]')
+    parser.add_option('--chunksize', type='int', default=500,
+                      help='records of standard input sent to a worker at '
+                      'a time [%default]')
+    parser.add_option('--chunk-bytes', type='int', default=1 << 22,
+                      help='size of the chunks FILE is split into for the '
+                      'workers [%default]')
+    parser.add_option('--top', type='int', default=10,
+                      help='number of most common errors to summarise '
+                      '[%default]')
+    parser.add_option('--checkpoint', metavar='PATH',
+                      help='where to save the progress of the run, to '
+                      'resume from it if the run is interrupted and '
+                      'restarted; needs FILE')
+    parser.add_option('--checkpoint-interval', type='float', default=60,
+                      metavar='SECONDS',
+                      help='how often to save the progress [%default]')
+    parser.add_option('-q', '--quiet', action='store_true',
+                      help='do not print the summary')
+    return parser
+
+
+def _check_stream(schema, schema_path, infile, format, options, context):
+    """
+    yields a (line number, result, errors, record) tuple for each
+    record read from infile.
+    """
+    if format == 'csv':
+        lines = read_csv(infile)
+    else:
+        lines = read_jsonl(infile)
+    # the records go both to the schema and, for the error rows,
+    # alongside its results; tee only buffers the records in flight
+    lines, records = itertools.tee(lines)
+    records = (record for lineno, record in records)
+    if options.workers > 1:
+        # the workers load the schema from its path themselves
+        results = validate_parallel(schema_path, records, options.workers,
+                                    options.chunksize, context,
+                                    compact=True)
+    else:
+        results = schema.validate_many(records, context, compact=True)
+    for (lineno, record), (index, result, errors) in \
+            itertools.izip(lines, results):
+        yield lineno, result, errors, record
+
+
+def _write(checked, collector, valid_writer, errors_writer, options):
+    for lineno, result, errors, record in checked:
+        collector.add(lineno, errors)
+        if errors is None:
+            if options.valid:
+                valid_writer.write(result)
+        elif options.errors:
+            errors_writer.write(dict(line=lineno,
+                                     record=record,
+                                     errors=errors))
+
+
+def _input(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime
+
+
+def _run_checkpointed(schema, schema_path, path, format, options, context,
+                      checkpoint, collector, valid_writer, errors_writer,
+                      started):
+    """
+    validates FILE a chunk at a time, saving a checkpoint every so
+    often: the offset and line number the chunks were validated up
+    to, the collector, the columns of CSV output and the sizes of
+    the output files, which are synced first.  A restarted run goes
+    on from there, cutting the output files back to those sizes, so
+    that every record is written out once.
+    """
+    offset, lineno = 0, None
+    if checkpoint is not None:
+        offset, lineno = checkpoint['offset'], checkpoint['lineno']
+    if options.workers > 1:
+        # the workers load the schema from its path themselves
+        schema = schema_path
+    outputs = dict(valid=valid_writer.f, errors=errors_writer.f)
+    outputs = dict((k, f) for k, f in outputs.iteritems()
+                   if getattr(options, k))
+    saved = time.time()
+    chunks = validate_chunks(schema, path, format, options.workers,
+                             options.chunk_bytes, context, compact=True,
+                             records=True, start=offset, lineno=lineno)
+    for end, lineno, results in chunks:
+        _write(results, collector, valid_writer, errors_writer, options)
+        now = time.time()
+        if now - saved >= options.checkpoint_interval:
+            columns = None
+            if getattr(valid_writer, 'writer', None) is not None:
+                columns = valid_writer.writer.fieldnames
+            _sync(*outputs.values())
+            save_checkpoint(options.checkpoint, dict(
+                input=_input(path),
+                offset=end,
+                lineno=lineno,
+                collector=collector,
+                columns=columns,
+                outputs=dict((k, f.tell())
+                             for k, f in outputs.iteritems()),
+                elapsed=now - started))
+            saved = now
+    # the outputs are complete: a rerun starts afresh
+    _sync(*outputs.values())
+    if os.path.exists(options.checkpoint):
+        os.remove(options.checkpoint)
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    parser = _parser()
+    options, args = parser.parse_args(argv)
+    if not 1 <= len(args) <= 2:
+        parser.error('expected SCHEMA and optionally FILE')
+    schema_path = args[0]
+    path = len(args) > 1 and args[1] or None
+    format = options.format or guess_format(path)
+    try:
+        schema = load_schema(schema_path)
+    except (ImportError, AttributeError, ValueError), e:
+        parser.error('cannot load schema %s: %s' % (schema_path, e))
+    context = None
+    if options.context:
+        try:
+            context = json.loads(options.context)
+        except ValueError, e:
+            parser.error('invalid --context: %s' % e)
+    if options.checkpoint:
+        if path is None or path == '-':
+            parser.error('--checkpoint needs a FILE')
+        if '-' in (options.valid, options.errors):
+            parser.error('--checkpoint cannot write to standard output')
+
+    # a file is split among the workers, which read their chunks
+    # themselves; standard input is sent to them a record at a time
+    split = path is not None and path != '-' and \
+            (options.workers > 1 or options.checkpoint)
+    infile = valid_out = errors_out = None
+    try:
+        checkpoint = None
+        if options.checkpoint:
+            checkpoint = load_checkpoint(options.checkpoint)
+            if checkpoint is not None and \
+                   checkpoint['input'] != _input(path):
+                parser.error('checkpoint %s is not for %s or it has '
+                             'changed since' % (options.checkpoint, path))
+        if not split:
+            infile = _open(path, format == 'csv' and 'rb' or 'r', stdin)
+        else:
+            # fail before the outputs are truncated
+            os.stat(path)
+        positions = checkpoint and checkpoint['outputs'] or {}
+        valid_out = _open(options.valid, 'wb', stdout,
+                          positions.get('valid'))
+        errors_out = _open(options.errors, 'w', stdout,
+                           positions.get('errors'))
+        if format == 'csv':
+            valid_writer = CSVWriter(valid_out,
+                                     checkpoint and checkpoint['columns'])
+        else:
+            valid_writer = JSONLWriter(valid_out)
+        errors_writer = JSONLWriter(errors_out)
+        collector = ErrorCollector()
+        start = time.time()
+        if options.checkpoint:
+            if checkpoint is not None:
+                collector = checkpoint['collector']
+                start -= checkpoint['elapsed']
+            _run_checkpointed(schema, schema_path, path, format, options,
+                              context, checkpoint, collector, valid_writer,
+                              errors_writer, start)
+        else:
+            if split:
+                # the workers load the schema from its path themselves
+                checked = validate_file(schema_path, path, format,
+                                        options.workers,
+                                        options.chunk_bytes, context,
+                                        compact=True, records=True)
+            else:
+                checked = _check_stream(schema, schema_path, infile,
+                                        format, options, context)
+            _write(checked, collector, valid_writer, errors_writer,
+                   options)
+        elapsed = time.time() - start
+    except (ValueError, EnvironmentError), e:
+        print >> stderr, '%s: %s' % (parser.get_prog_name(), e)
+        return 2
+    finally:
+        for f in (infile, valid_out, errors_out):
+            if f not in (None, stdin, stdout):
+                f.close()
+    if not options.quiet:
+        rate = elapsed and collector.records / elapsed or 0
+        print >> stderr, '%d records (%d valid, %d invalid) in %.2f ' \
+              'seconds: %.0f records/sec' % (
+                  collector.records, collector.records - collector.invalid,
+                  collector.invalid, elapsed, rate)
+        if collector.invalid:
+            print >> stderr, collector.report(options.top).split('\n', 1)[1]
+    return collector.invalid and 1 or 0
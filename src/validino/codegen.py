@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generates a specialised Python function for the field loop of a
+Schema (see Schema's codegen option).
+
+The generated function fetches each field's value and runs its
+subvalidators as straight-line code.  A handful of common built-in
+validators are inlined outright; anything else is called as it would
+be by the interpreted Schema, so the result and the error dictionary
+are the same either way.
+"""
+
+from validino import base
+from validino.base import Invalid, _Failure, _applier, _msg
+
+
+class _Generator(object):
+    """
+    accumulates the source and the namespace of the generated
+    function.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.namespace = dict(Invalid=Invalid, _Failure=_Failure)
+        self._counter = 0
+        # the statement recording the current field as failed, if
+        # failures need to be tracked.
+        self.record = None
+
+    def const(self, value):
+        """
+        binds value to a fresh name in the generated function's
+        namespace and returns that name.
+        """
+        name = '_c%d' % self._counter
+        self._counter += 1
+        self.namespace[name] = value
+        return name
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def fail(self, indent, key, message):
+        """
+        emits the code recording message as the error for key, as
+        Schema would after catching Invalid(message), and leaving the
+        field's block.
+        """
+        if message and isinstance(message, basestring):
+            self.emit(indent, 'exceptions[%s] = %s' % (key, self.const(message)))
+        else:
+            self.emit(indent, 'exceptions[%s] = %s'
+                      % (key, self.const(_Failure(message))))
+        self.leave(indent)
+
+    def leave(self, indent):
+        """
+        emits the code leaving the block of a field that failed.
+        """
+        if self.record:
+            self.emit(indent, self.record)
+        self.emit(indent, 'break')
+
+    def validator(self, indent, key, vfunc, keyword):
+        """
+        emits the code applying vfunc to the variable v.  keyword
+        tells whether the interpreted path would pass the context as a
+        keyword argument (as all_of does) or positionally (as Schema
+        does), should vfunc have to be called.
+        """
+        vtype = type(vfunc)
+        if vfunc is base.strip:
+            self._strip(indent)
+        elif vtype is base.all_of:
+            for v in vfunc.validators:
+                self.validator(indent, key, v, True)
+        elif vtype in _inliners:
+            _inliners[vtype](self, indent, key, **vfunc.params)
+        else:
+            name = self.const(_applier(vfunc, keyword))
+            self.emit(indent, 'v = %s(v, context)' % name)
+            self.emit(indent, 'if type(v) is _Failure:')
+            self.emit(indent + 1, 'exceptions[v.name(%s)] = v' % key)
+            self.leave(indent + 1)
+
+    def _strip(self, indent):
+        self.emit(indent, 'try:')
+        self.emit(indent + 1, 'v = v.strip()')
+        self.emit(indent, 'except AttributeError:')
+        self.emit(indent + 1, 'pass')
+
+    def _not_empty(self, indent, key, msg):
+        self.emit(indent, "if not (v != '' and v != None):")
+        self.fail(indent + 1, key,
+                  _msg(msg, 'notempty', "A non-empty value was expected"))
+
+    def _clamp_length(self, indent, key, min, max, msg):
+        self.emit(indent, 'n = len(v)')
+        if min is not None:
+            self.emit(indent, 'if n < %s:' % self.const(min))
+            self.fail(indent + 1, key, _msg(msg, "minlen", "too short"))
+        if max is not None:
+            self.emit(indent, 'if n > %s:' % self.const(max))
+            self.fail(indent + 1, key, _msg(msg, "maxlen", "too long"))
+
+    def _default(self, indent, key, defaultValue):
+        self.emit(indent, 'if v is None:')
+        self.emit(indent + 1, 'v = %s' % self.const(defaultValue))
+
+    def _belongs(self, indent, key, domain, msg):
+        self.emit(indent, 'if v not in %s:' % self.const(domain))
+        self.fail(indent + 1, key, _msg(msg, "belongs", "invalid choice"))
+
+    def _to_integer(self, indent, key, msg):
+        self.emit(indent, 'try:')
+        self.emit(indent + 1, 'v = int(v)')
+        self.emit(indent, 'except (TypeError, ValueError):')
+        self.fail(indent + 1, key, _msg(msg, "integer", "not an integer"))
+
+
+# only the exact types are inlined, since subclasses may behave
+# differently.
+_inliners = {
+    base.not_empty: _Generator._not_empty.im_func,
+    base.clamp_length: _Generator._clamp_length.im_func,
+    base.default: _Generator._default.im_func,
+    base.belongs: _Generator._belongs.im_func,
+    base.to_integer: _Generator._to_integer.im_func,
+    }
+
+
+def generate(steps):
+    """
+    takes the steps of a compiled Schema plan and returns a tuple of
+    (function, source), where function(data, result, context,
+    exceptions, fail_fast) validates data, storing converted values in
+    result and errors in exceptions, exactly like Schema._run_steps().
+    """
+    g = _Generator()
+    g.emit(0, 'def validate(data, result, context, exceptions, fail_fast):')
+    track = [step for step in steps if step[1]]
+    if track:
+        # plural keys are skipped once any of their fields has failed
+        g.emit(1, 'failed = set()')
+    for k, have_plural, vfunc, apply in steps:
+        key = g.const(k)
+        g.emit(1, '# %r' % (k,))
+        if have_plural:
+            g.record = 'failed.update(%s)' % key
+            items = ', '.join('result.get(%s, data.get(%s))' % (a, a)
+                              for a in [g.const(x) for x in k])
+            g.emit(1, 'while failed.isdisjoint(%s):' % key)
+            g.emit(2, 'v = (%s)' % (items and items + ','))
+        else:
+            if track:
+                g.record = 'failed.add(%s)' % key
+            g.emit(1, 'v = result.get(%s, data.get(%s))' % (key, key))
+            g.emit(1, 'while 1:')
+        g.validator(2, key, vfunc, False)
+        if have_plural:
+            g.emit(2, 'result.update(zip(%s, v))' % key)
+        else:
+            g.emit(2, 'result[%s] = v' % key)
+        g.emit(2, 'break')
+        g.emit(1, 'if fail_fast and exceptions:')
+        g.emit(2, 'return')
+    if not steps:
+        g.emit(1, 'pass')
+    source = '\n'.join(g.lines) + '\n'
+    code = compile(source, '<validino schema>', 'exec')
+    exec code in g.namespace
+    return g.namespace['validate'], source
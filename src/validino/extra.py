@@ -9,24 +9,16 @@ import re
 import socket
 import urlparse
 
-from validino.base import Invalid, _msg, regex
+from validino.base import (Validator, _Failure, _add_error_message, _msg,
+                           regex)
 import validino.ccvalidate as _cc
+from validino.resolver import ResolverError, default_resolver
 from validino.util import partial
 
 # lifted from formencode
 _usernameRE = re.compile(r"^[^ \t\n\r@<>()]+$", re.I)
 _domainRE = re.compile(r"^[a-z0-9][a-z0-9\.\-_]*\.[a-z]+$", re.I)
 
-try:
-    import DNS
-except ImportError:
-    DNS = None
-else:
-    try:
-        DNS.DiscoverNameServers()
-    except IOError:
-        DNS = None
-
 __all__ = [
     'email',
     'credit_card',
@@ -34,70 +26,101 @@ __all__ = [
     'url']
 
 
-def email(check_dns=False, msg=None):
-    if check_dns and DNS is None:
-        raise RuntimeError, "pyDNS not installed, cannot check DNS"
-    def f(value):
+class email(Validator):
+    """
+    checks the format of an email address and, if check_dns is true,
+    that its domain has mail hosts, looking it up with resolver or
+    else the default resolver (see validino.resolver).  The resolver
+    is not pickled: an unpickled email uses the default one.
+    """
+    __slots__ = ('check_dns', 'msg', 'resolver')
+
+    _local_params = ('resolver',)
+
+    def __init__(self, check_dns=False, msg=None, resolver=None):
+        if check_dns and resolver is None:
+            # fails early if there is no resolver to be had
+            default_resolver()
+        self.check_dns = check_dns
+        self.msg = msg
+        self.resolver = resolver
+
+    # the DNS may change
+    pure = property(lambda self: not self.check_dns)
+    io_bound = property(lambda self: self.check_dns)
+
+    def _apply(self, value, context):
         try:
             username, domain = value.split('@', 1)
         except ValueError:
-            raise Invalid(_msg(f.msg,
-                               'email.format',
-                               'invalid format'))
+            return _Failure(_msg(self.msg,
+                                 'email.format',
+                                 'invalid format'))
         if not _usernameRE.match(username):
-            raise Invalid(_msg(f.msg,
-                               'email.username',
-                               'invalid username'))
+            return _Failure(_msg(self.msg,
+                                 'email.username',
+                                 'invalid username'))
         if not _domainRE.match(domain):
-            raise Invalid(_msg(f.msg,
-                               'email.domain',
-                               'invalid domain'))
-        if f.check_dns:
+            return _Failure(_msg(self.msg,
+                                 'email.domain',
+                                 'invalid domain'))
+        if self.check_dns:
+            resolver = self.resolver or default_resolver()
             try:
-                a = DNS.DnsRequest(domain, qtype='mx').req().answers
-                if not a:
-                    a = DNS.DnsRequest(domain, qtype='a').req().answers
-                dnsdomains = [x['data'] for x in a]
-            except (socket.error, DNS.DNSError), e:
-                raise Invalid(_msg(f.msg,
-                                   'email.socket_error',
-                                   'socket error'))
-            if not dnsdomains:
-                raise Invalid(_msg(f.msg,
-                                   'email.domain_error',
-                                   'no such domain'))
+                hosts, ttl = resolver.lookup(domain)
+            except ResolverError:
+                return _Failure(_msg(self.msg,
+                                     'email.socket_error',
+                                     'socket error'))
+            if not hosts:
+                return _Failure(_msg(self.msg,
+                                     'email.domain_error',
+                                     'no such domain'))
         return value
-    f.check_dns = check_dns
-    f.msg = msg
-    return f
-
-def credit_card(types=None,
-                require_type=False,
-                msg=None,
-                cc_field='cc_number',
-                cc_type_field='cc_type'):
-    if types is None:
-        types = _cc.cards
-
-    def f(values):
+
+
+class credit_card(Validator):
+    __slots__ = ('types',
+                 'require_type',
+                 'msg',
+                 'cc_field',
+                 'cc_type_field')
+
+    pure = True
+
+    def __init__(self,
+                 types=None,
+                 require_type=False,
+                 msg=None,
+                 cc_field='cc_number',
+                 cc_type_field='cc_type'):
+        if types is None:
+            types = _cc.cards
+        self.types = types
+        self.require_type = require_type
+        self.msg = msg
+        self.cc_field = cc_field
+        self.cc_type_field = cc_type_field
+
+    def _apply(self, values, context):
         if isinstance(values, (list, tuple)):
             cardnumber, cc_type = values
         else:
             cardnumber, cc_type = values, None
 
-        exc = Invalid()
-        type_ok = not f.require_type
+        errors = {}
+        type_ok = not self.require_type
 
-        if f.require_type and cc_type is None:
-            m = _msg(f.msg,
+        if self.require_type and cc_type is None:
+            m = _msg(self.msg,
                    "credit_card.require_type",
                    "no credit card type specified")
-            exc.add_error_message(f.cc_type_field, m)
-        elif not (cc_type is None) and cc_type not in f.types:
-            m = _msg(f.msg,
+            _add_error_message(errors, self.cc_type_field, m)
+        elif not (cc_type is None) and cc_type not in self.types:
+            m = _msg(self.msg,
                    "credit_card.type_check",
                    "unrecognized credit card type")
-            exc.add_error_message(f.cc_type_field, m)
+            _add_error_message(errors, self.cc_type_field, m)
         else:
             type_ok = True
 
@@ -107,21 +130,15 @@ def credit_card(types=None,
             else:
                 _cc.check_credit_card(cardnumber)
         except _cc.CreditCardValidationException:
-            m = _msg(f.msg,
+            m = _msg(self.msg,
                    "credit_card.invalid",
                    "invalid credit card number")
-            exc.add_error_message(f.cc_field, m)
+            _add_error_message(errors, self.cc_field, m)
 
-        if exc.errors:
-            raise exc
+        if errors:
+            return _Failure(errors)
         else:
             return values
-    f.types = types
-    f.require_type = require_type
-    f.msg = msg
-    f.cc_field = cc_field
-    f.cc_type_field = cc_type_field
-    return f
 
 _ip_pat = '^%s$' % r'\.'.join(['|'.join([str(x) for x in range(256)]*4)])
 
@@ -130,28 +147,45 @@ ip.__doc__ = """
 Returns a validator that tests whether an ip address is properly formed.
 """
 
-def url(check_exists=False,
-        schemas=('http', 'https'),
-        default_schema='http',
-        default_host='',
-        msg=None):
-
-    def f(value):
-        if f.check_exists and set(f.schemas).difference(set(('http', 'https'))):
+class url(Validator):
+    __slots__ = ('check_exists',
+                 'schemas',
+                 'default_schema',
+                 'default_host',
+                 'msg')
+
+    def __init__(self,
+                 check_exists=False,
+                 schemas=('http', 'https'),
+                 default_schema='http',
+                 default_host='',
+                 msg=None):
+        self.check_exists = check_exists
+        self.schemas = schemas
+        self.default_schema = default_schema
+        self.default_host = default_host
+        self.msg = msg
+
+    # the url may stop existing
+    pure = property(lambda self: not self.check_exists)
+    io_bound = property(lambda self: self.check_exists)
+
+    def _apply(self, value, context):
+        if self.check_exists and set(self.schemas).difference(set(('http', 'https'))):
             m = "existence check not supported for schemas other than http and https"
             raise RuntimeError(m)
         schema, netloc, path, params, query, fragment = urlparse.urlparse(value)
-        if schema not in f.schemas:
-            raise Invalid(_msg(f.msg,
-                               "url.schema",
-                               "schema not allowed"))
-        if schema == '' and f.default_schema:
-            schema = f.default_schema
-        if netloc == '' and f.default_host:
-            netloc = f.default_host
+        if schema not in self.schemas:
+            return _Failure(_msg(self.msg,
+                                 "url.schema",
+                                 "schema not allowed"))
+        if schema == '' and self.default_schema:
+            schema = self.default_schema
+        if netloc == '' and self.default_host:
+            netloc = self.default_host
 
         url = urlparse.urlunparse((schema, netloc, path, params, query, fragment))
-        if f.check_exists:
+        if self.check_exists:
             newpath = urlparse.urlunparse(('', '', path, params, query, fragment))
             if schema == 'http':
                 conn = httplib.HTTPConnection
@@ -164,20 +198,14 @@ def url(check_exists=False,
                 c.request('HEAD', newpath)
                 res = c.getresponse()
             except (httplib.HTTPException, socket.error), e:
-                raise Invalid(_msg(f.msg,
-                                   "url.http_error",
-                                   "http error"))
+                return _Failure(_msg(self.msg,
+                                     "url.http_error",
+                                     "http error"))
             else:
                 if 200 <= res.status < 400:
                     # this fudges on redirects.
                     return url
-                raise Invalid(_msg(f.msg,
-                                   'url.not_exists',
-                                   "url not OK"))
+                return _Failure(_msg(self.msg,
+                                     'url.not_exists',
+                                     "url not OK"))
         return url
-    f.default_schema = default_schema
-    f.default_host = default_host
-    f.check_exists = check_exists
-    f.schemas = schemas
-    f.msg = msg
-    return f
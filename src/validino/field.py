@@ -19,9 +19,9 @@ class Field(object):
     def _make_validator(self, validators):
         validators = self._default_validators + validators
         if not self.required:
-            return V.either(V.empty(), V.compose(*validators))
+            return V.either(V.empty(), V.all_of(*validators))
         else:
-            return V.compose(*validators)
+            return V.all_of(*validators)
 
     def __getattr__(self, k):
         try:
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reading and validating JSON-lines and CSV files.
+
+>>> from validino.files import validate_file
+>>> for lineno, result, errors in validate_file(schema, 'export.jsonl'):
+...     handle(lineno, result, errors)
+
+validate_file() memory-maps the file and splits it into chunks of
+about a given number of bytes, ending on line boundaries, which the
+worker processes read, parse and validate for themselves: only the
+byte offsets of the chunks are sent to the workers, and only the
+results come back.  Records therefore may not span lines, which
+rules out CSV fields with embedded newlines.
+"""
+
+import cPickle as pickle
+import csv
+import errno
+import itertools
+import mmap
+import os
+import tempfile
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from validino import parallel
+from validino.util import intern_value
+
+__all__ = [
+    'chunk_ranges',
+    'load_checkpoint',
+    'read_csv',
+    'read_jsonl',
+    'save_checkpoint',
+    'validate_chunks',
+    'validate_file']
+
+
+def guess_format(path):
+    """
+    returns 'csv' if path ends in .csv, 'jsonl' otherwise.
+    """
+    if path and path.lower().endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+def read_jsonl(f, offset=None):
+    """
+    yields a (line number, record) tuple for each non-blank line of
+    f, an iterable of lines.  A ValueError is raised for invalid JSON,
+    or JSON that is not an object, giving its line number or, if
+    offset (the byte offset of the first line in the file) is given,
+    its byte offset.
+    """
+    for lineno, line in enumerate(f, 1):
+        if line.strip():
+            if offset is None:
+                where = 'line %d' % lineno
+            else:
+                where = 'byte %d' % offset
+            try:
+                record = json.loads(line)
+            except ValueError, e:
+                raise ValueError('%s: invalid JSON: %s' % (where, e))
+            if not isinstance(record, dict):
+                raise ValueError('%s: expected a JSON object' % where)
+            yield lineno, record
+        if offset is not None:
+            offset += len(line)
+
+
+def read_csv(f, fieldnames=None):
+    """
+    yields a (line number, record) tuple for each row of f, an
+    iterable of lines, which starts with a header unless fieldnames
+    is given.
+    """
+    reader = csv.DictReader(f, fieldnames)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _csv_header(mm):
+    end = mm.find('\n')
+    if end < 0:
+        end = mm.size()
+    else:
+        end += 1
+    return csv.reader([mm[:end]]).next(), end
+
+
+def chunk_ranges(path, chunk_bytes=1 << 22, start=0):
+    """
+    returns a list of (start, end) byte offsets splitting the file at
+    path, from start, into chunks of about chunk_bytes, each of which
+    ends just after a newline or at the end of the file.
+    """
+    f = open(path, 'rb')
+    try:
+        size = os.fstat(f.fileno()).st_size
+        if start >= size:
+            return []
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _chunk_ranges(mm, chunk_bytes, start)
+        finally:
+            mm.close()
+    finally:
+        f.close()
+
+
+def _chunk_ranges(mm, chunk_bytes, start):
+    size = mm.size()
+    ranges = []
+    while start < size:
+        end = mm.find('\n', min(start + chunk_bytes, size) - 1)
+        if end < 0:
+            end = size
+        else:
+            end += 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _read_range(path, start, end):
+    f = open(path, 'rb')
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return mm[start:end]
+        finally:
+            mm.close()
+    finally:
+        f.close()
+
+
+def _check_range(schema, path, format, fieldnames, start, end, context,
+                 compact, keep):
+    """
+    validates the records in the given byte range of the file,
+    returning the number of lines in it and a list of (line number
+    within the range, result, errors, record) tuples, where record is
+    only kept (if keep is true) for invalid records.
+    """
+    data = _read_range(path, start, end)
+    lines = data.splitlines(True)
+    if format == 'csv':
+        parsed = list(read_csv(lines, fieldnames))
+    else:
+        parsed = list(read_jsonl(lines, start))
+    results = []
+    validated = schema.validate_many([r for lineno, r in parsed],
+                                     context, compact)
+    for (lineno, record), (i, result, errors) in zip(parsed, validated):
+        if errors is None or not keep:
+            record = None
+        results.append((lineno, result, errors, record))
+    return len(lines), results
+
+
+def _validate_range(*args):
+    return _check_range(parallel._schema, *args)
+
+
+def validate_chunks(schema, path, format=None, workers=None,
+                    chunk_bytes=1 << 22, context=None, compact=False,
+                    records=False, start=0, lineno=None):
+    """
+    validates the file at path as validate_file() does, but yields an
+    (end, lineno, results) tuple for each chunk, in order: the byte
+    offset just after the chunk, the number of its last line, and the
+    list of tuples validate_file() would yield for its records.
+
+    start and lineno, the byte offset and line number where a
+    previous run stopped, resume the validation there.
+    """
+    if format is None:
+        format = guess_format(path)
+    fieldnames = None
+    f = open(path, 'rb')
+    try:
+        if os.fstat(f.fileno()).st_size:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if format == 'csv':
+                    fieldnames, header = _csv_header(mm)
+                    start = max(start, header)
+                ranges = _chunk_ranges(mm, chunk_bytes, start)
+            finally:
+                mm.close()
+        else:
+            ranges = []
+    finally:
+        f.close()
+    if lineno is None:
+        lineno = fieldnames is not None and 1 or 0
+
+    tasks = ((path, format, fieldnames, start, end, context, compact,
+              records)
+             for start, end in ranges)
+    if workers == 1:
+        if isinstance(schema, basestring):
+            schema = parallel.load_schema(schema)
+        chunks = (_check_range(schema, *args) for args in tasks)
+    else:
+        chunks = parallel._run_pool(schema, _validate_range, tasks, workers)
+
+    table = {}
+    for (start, end), (count, checked) in itertools.izip(ranges, chunks):
+        results = []
+        for i, result, errors, record in checked:
+            if compact and errors:
+                errors = intern_value(errors, table)
+            if records:
+                results.append((lineno + i, result, errors, record))
+            else:
+                results.append((lineno + i, result, errors))
+        lineno += count
+        yield end, lineno, results
+
+
+def validate_file(schema, path, format=None, workers=None,
+                  chunk_bytes=1 << 22, context=None, compact=False,
+                  records=False):
+    """
+    validates the records in the JSON-lines or CSV file at path (see
+    guess_format() for the default format), yielding a (line number,
+    result, errors) tuple for each in order, as validate_many() does
+    but with the record's line number in the file.  If records is
+    true, the tuples also hold the record itself as a fourth item for
+    invalid records (and None for valid ones).
+
+    The file is split into chunks of about chunk_bytes, validated by
+    a pool of worker processes (see validate_parallel() for schema
+    and workers); with a single worker, they are validated in this
+    process instead.  compact is passed on to validate_many().
+    """
+    for end, lineno, results in validate_chunks(schema, path, format,
+                                                workers, chunk_bytes,
+                                                context, compact, records):
+        for item in results:
+            yield item
+
+
+def load_checkpoint(path):
+    """
+    returns the state saved by save_checkpoint() at path, or None if
+    there is no such file.
+    """
+    try:
+        f = open(path, 'rb')
+    except IOError, e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+    try:
+        return pickle.load(f)
+    finally:
+        f.close()
+
+
+def save_checkpoint(path, state):
+    """
+    saves state, a picklable object, to path, atomically: the file is
+    written under a temporary name, synced, and renamed over path, so
+    that path holds either the previous state or the new one even if
+    the process dies meanwhile.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.checkpoint', dir=directory)
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measuring the memory taken up by validation results.
+
+>>> from validino.memory import profile_memory
+>>> print profile_memory(schema, sample_records)
+
+Python 2 has no tracemalloc, so what is measured is the memory the
+results hold on to -- the converted data of valid records and the
+errors of invalid ones -- which is what grows with the size of a
+batch.  Objects shared between records, such as messages, are
+counted once.  Compare with compact=True (see
+Schema.validate_many()) to see how much compact errors save.
+"""
+
+import sys
+
+from validino.base import Invalid, _Failure
+
+__all__ = [
+    'deep_size',
+    'profile_memory']
+
+
+def deep_size(obj):
+    """
+    returns the number of bytes taken up by obj and everything it
+    refers to through containers, Invalid exceptions and failures,
+    counting shared objects once.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.iterkeys())
+            stack.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, Invalid):
+            stack.append(obj._errors)
+            stack.append(obj.args)
+            stack.append(getattr(obj, 'field', None))
+        elif type(obj) is _Failure:
+            stack.append(obj.errors)
+            stack.append(obj.field)
+            stack.append(obj.exception)
+    return size
+
+
+class MemoryProfile(object):
+    """
+    the outcome of profile_memory(): the numbers of valid and invalid
+    records, and the bytes their results and errors take up, in total
+    and per record.
+    """
+    __slots__ = ('valid', 'invalid', 'valid_bytes', 'invalid_bytes')
+
+    def __init__(self, valid, invalid, valid_bytes, invalid_bytes):
+        self.valid = valid
+        self.invalid = invalid
+        self.valid_bytes = valid_bytes
+        self.invalid_bytes = invalid_bytes
+
+    @property
+    def bytes_per_valid(self):
+        return self.valid and float(self.valid_bytes) / self.valid
+
+    @property
+    def bytes_per_invalid(self):
+        return self.invalid and float(self.invalid_bytes) / self.invalid
+
+    def __str__(self):
+        return ('%d valid records: %.0f bytes each\n'
+                '%d invalid records: %.0f bytes each' % (
+                    self.valid, self.bytes_per_valid,
+                    self.invalid, self.bytes_per_invalid))
+
+
+def profile_memory(schema, records, context=None, compact=False):
+    """
+    validates records with schema, keeping all the results and errors
+    (so records should be a representative sample rather than a whole
+    file), and returns a MemoryProfile of the memory they take up.
+    """
+    results = []
+    errors = []
+    for index, result, error in schema.validate_many(records, context,
+                                                     compact=compact):
+        if error is None:
+            results.append(result)
+        else:
+            errors.append(error)
+    # not counting the lists themselves
+    return MemoryProfile(len(results),
+                         len(errors),
+                         deep_size(results) - sys.getsizeof(results),
+                         deep_size(errors) - sys.getsizeof(errors))
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentation of Schema validation.
+
+An observer is any object with a method record(kind, name, seconds,
+outcome), which is called once for every field ('field' kind) and
+every subvalidator ('validator' kind) a schema runs, with the time it
+took and its outcome: 'ok', 'failure' (it found the value invalid)
+or 'error' (it raised some other exception).  Stats is an observer
+that adds all that up.
+
+A schema reports to its own observer, if it was given one, or else
+to the observer installed for the whole process by instrument():
+
+>>> stats = Stats()
+>>> with instrument(stats):
+...     schema(data)
+>>> print stats.report()
+
+Field names are the schema keys, with the fields of a plural key
+joined by commas; subvalidators are named after the field, their
+position in its list of subvalidators and their own name (that of
+the validator they cache, for memoize), as in 'email[1]:not_empty'.  Each of them is also run through a function
+of its own, named after it, so that cProfile and py-spy list the
+time spent on every field and subvalidator separately.
+"""
+
+import contextlib
+import re
+import threading
+import weakref
+from timeit import default_timer
+
+from validino import base
+from validino.base import _Failure, _applier, all_of, memoize
+
+__all__ = [
+    'Stats',
+    'instrument']
+
+
+@contextlib.contextmanager
+def instrument(observer):
+    """
+    makes observer the observer of every schema that does not have
+    its own, in all threads, until the block ends.
+    """
+    previous = base._observer
+    base._observer = observer
+    try:
+        yield observer
+    finally:
+        base._observer = previous
+
+
+class Timing(object):
+    """
+    the number of calls, failures and errors of a field or
+    subvalidator, and the seconds spent in it.
+    """
+    __slots__ = ('calls', 'failures', 'errors', 'seconds')
+
+    def __init__(self):
+        self.calls = self.failures = self.errors = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return 'Timing(calls=%d, failures=%d, errors=%d, seconds=%f)' % (
+            self.calls, self.failures, self.errors, self.seconds)
+
+
+class Stats(object):
+    """
+    an observer which keeps a Timing for every field and subvalidator,
+    by name, in the fields and validators dictionaries.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.validators = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, seconds, outcome):
+        if kind == 'field':
+            timings = self.fields
+        else:
+            timings = self.validators
+        with self._lock:
+            timing = timings.get(name)
+            if timing is None:
+                timing = timings[name] = Timing()
+            timing.calls += 1
+            timing.seconds += seconds
+            if outcome == 'failure':
+                timing.failures += 1
+            elif outcome == 'error':
+                timing.errors += 1
+
+    def clear(self):
+        with self._lock:
+            self.fields.clear()
+            self.validators.clear()
+
+    def report(self):
+        """
+        returns a table of the fields and then the subvalidators, the
+        slowest first.
+        """
+        lines = ['%-40s %8s %8s %8s %12s'
+                 % ('name', 'calls', 'failures', 'errors', 'seconds')]
+        with self._lock:
+            for timings in (self.fields, self.validators):
+                for name, t in sorted(timings.iteritems(),
+                                      key=lambda item: -item[1].seconds):
+                    lines.append('%-40s %8d %8d %8d %12.6f'
+                                 % (name, t.calls, t.failures, t.errors,
+                                    t.seconds))
+        return '\n'.join(lines)
+
+
+_template = '''
+def %(function)s(value, context):
+    start = clock()
+    try:
+        result = apply(value, context)
+    except Exception:
+        record(kind, name, clock() - start, 'error')
+        raise
+    if type(result) is _Failure:
+        record(kind, name, clock() - start, 'failure')
+    else:
+        record(kind, name, clock() - start, 'ok')
+    return result
+'''
+
+
+def _timed(kind, name, apply, record):
+    """
+    returns a function of (value, context) named after name, which
+    calls apply and reports to record, an observer's record method.
+    """
+    function = 'validate_' + re.sub(r'\W+', '_', name).strip('_')
+    source = _template % dict(function=function)
+    namespace = dict(clock=default_timer,
+                     apply=apply,
+                     record=record,
+                     kind=kind,
+                     name=name,
+                     _Failure=_Failure)
+    exec compile(source, '<validino %s>' % name, 'exec') in namespace
+    return namespace[function]
+
+
+def _chain(appliers):
+    def apply(value, context):
+        for a in appliers:
+            value = a(value, context)
+            if type(value) is _Failure:
+                break
+        return value
+    return apply
+
+
+def _recorder(observer):
+    """
+    returns a function which passes its arguments on to the record
+    method of observer, holding only a weak reference to it if it
+    can.
+    """
+    try:
+        ref = weakref.ref(observer)
+    except TypeError:
+        return observer.record
+    def record(kind, name, seconds, outcome):
+        observer = ref()
+        if observer is not None:
+            observer.record(kind, name, seconds, outcome)
+    return record
+
+
+def _name(validator):
+    """
+    returns the name of validator, or of the one it memoizes.
+    """
+    if type(validator) is memoize:
+        validator = validator.validator
+    return getattr(validator, '__name__', None) or type(validator).__name__
+
+
+def observed_steps(steps, observer):
+    """
+    returns the steps of a compiled Schema plan, with every field and
+    subvalidator reporting to observer.
+    """
+    record = _recorder(observer)
+    result = []
+    for k, have_plural, vfunc, apply in steps:
+        if have_plural:
+            field = ','.join('%s' % (x,) for x in k)
+        else:
+            field = '%s' % (k,)
+        if type(vfunc) is all_of:
+            validators = [(v, _applier(v)) for v in vfunc.validators]
+        else:
+            validators = [(vfunc, apply)]
+        appliers = []
+        for i, (v, a) in enumerate(validators):
+            name = '%s[%d]:%s' % (field, i, _name(v))
+            appliers.append(_timed('validator', name, a, record))
+        if len(appliers) == 1:
+            chain = appliers[0]
+        else:
+            chain = _chain(appliers)
+        result.append((k, have_plural, vfunc,
+                       _timed('field', field, chain, record)))
+    return tuple(result)
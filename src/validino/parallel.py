@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Validation of large batches of records across several processes.
+
+>>> from validino.parallel import validate_parallel
+>>> for index, result, errors in validate_parallel(schema, records):
+...     handle(index, result, errors)
+
+The schema is not sent to the worker processes.  Either the workers
+inherit it when the pool forks (which works for any schema, including
+ones built from closures), or the schema is given as a dotted path
+such as 'myapp.forms:signup_schema', which each worker imports for
+itself.  Only the records and the validation results travel between
+processes, a chunk at a time.
+"""
+
+import collections
+import itertools
+import multiprocessing
+
+from validino.util import intern_value
+
+__all__ = [
+    'load_schema',
+    'validate_parallel']
+
+
+# the schema used by the current worker process
+_schema = None
+
+
+def load_schema(path):
+    """
+    imports and returns the object named by a dotted path, either in
+    the form 'package.module:attribute' or 'package.module.attribute'.
+    """
+    if ':' in path:
+        modname, attr = path.split(':', 1)
+    else:
+        modname, attr = path.rsplit('.', 1)
+    module = __import__(modname, {}, {}, [attr])
+    obj = module
+    for name in attr.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def _init_worker(schema):
+    global _schema
+    if isinstance(schema, basestring):
+        schema = load_schema(schema)
+    _schema = schema
+
+
+def _validate_chunk(start, records, context, compact):
+    return [(start + index, result, errors)
+            for index, result, errors
+            in _schema.validate_many(records, context, compact)]
+
+
+def _chunks(records, chunksize):
+    records = iter(records)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(records, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _results(chunk, compact, table):
+    if compact:
+        # share the errors again, as they are unpickled separately
+        return [(index, result, errors and intern_value(errors, table))
+                for index, result, errors in chunk]
+    return chunk
+
+
+def validate_parallel(schema, records, workers=None, chunksize=500,
+                      context=None, compact=False):
+    """
+    validates each of the dictionaries in records with schema in a
+    pool of worker processes, yielding (index, result, errors) tuples
+    in input order, as Schema.validate_many() does.
+
+    schema may be a Schema, or a dotted path to one (see
+    load_schema()), which is needed on platforms where the pool cannot
+    fork.  workers defaults to the number of CPUs.  Records are sent
+    to the workers in chunks of chunksize, and only a few chunks per
+    worker are in flight at any time, so records is consumed lazily
+    and memory use stays bounded.  compact is passed on to
+    validate_many().
+    """
+    tasks = ((start, chunk, context, compact)
+             for start, chunk in _chunks(records, chunksize))
+    table = {}
+    for chunk in _run_pool(schema, _validate_chunk, tasks, workers):
+        for item in _results(chunk, compact, table):
+            yield item
+
+
+def _run_pool(schema, func, tasks, workers=None):
+    """
+    applies func to each tuple of arguments in tasks in a pool of
+    workers processes (by default, one per CPU) that have schema (or
+    the Schema at that dotted path) as their _schema, yielding the
+    results in order.  tasks is consumed lazily, with only a few tasks
+    per worker in flight at any time.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers, _init_worker, (schema,))
+    try:
+        pending = collections.deque()
+        for args in tasks:
+            pending.append(pool.apply_async(func, args))
+            if len(pending) > 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
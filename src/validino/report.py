@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+Aggregated error reporting for batch validation.
+
+>>> collector = ErrorCollector(examples=3, sample_size=10)
+>>> for index, result, errors in schema.validate_many(records):
+...     if errors is None:
+...         load(result)
+...     else:
+...         collector.add(index, errors)
+>>> print collector.report()
+
+Rather than keeping the errors of every record, the collector counts
+each distinct (path, message) pair, keeps the indexes of the first
+few records with an error for each field, and a random sample of
+bounded size (a reservoir sample) of the records with each pair, so
+that the memory it uses does not grow with the number of records.
+"""
+
+import random
+
+from validino.util import compact_errors
+
+__all__ = ['ErrorCollector']
+
+
+class ErrorCount(object):
+    """
+    the number of records with a (path, message) pair of errors, and
+    a random sample of their indexes.
+    """
+    __slots__ = ('count', 'sample')
+
+    def __init__(self):
+        self.count = 0
+        self.sample = []
+
+    def __repr__(self):
+        return 'ErrorCount(count=%d, sample=%r)' % (self.count, self.sample)
+
+
+class ErrorCollector(object):
+    """
+    aggregates the errors of a batch of records.
+
+    counts maps each (path, message) pair (see util.compact_errors())
+    to an ErrorCount, whose sample holds up to sample_size indexes of
+    the records with that error, chosen uniformly at random.  examples
+    maps each path to the indexes of the first examples records with
+    an error there.  At most max_errors distinct pairs are counted;
+    the errors beyond those are only added up in overflow.  records
+    and invalid count the records seen and those with errors.
+    """
+
+    def __init__(self, examples=5, sample_size=20, max_errors=1000,
+                 seed=None):
+        self.examples_size = examples
+        self.sample_size = sample_size
+        self.max_errors = max_errors
+        self.counts = {}
+        self.examples = {}
+        self.overflow = 0
+        self.records = 0
+        self.invalid = 0
+        self._random = random.Random(seed)
+        # shares the pairs of the errors given unpacked
+        self._interned = {}
+
+    def add(self, index, errors):
+        """
+        records the errors of the record at index, as unpacked (a
+        dictionary) or compact (a tuple of (path, message) pairs), or
+        just counts the record if errors is None.
+        """
+        self.records += 1
+        if errors is None:
+            return
+        self.invalid += 1
+        if isinstance(errors, dict):
+            errors = compact_errors(errors, self._interned)
+        for pair in errors:
+            counted = self.counts.get(pair)
+            if counted is None:
+                if len(self.counts) >= self.max_errors:
+                    self.overflow += 1
+                    continue
+                counted = self.counts[pair] = ErrorCount()
+            counted.count += 1
+            sample = counted.sample
+            if len(sample) < self.sample_size:
+                sample.append(index)
+            else:
+                i = self._random.randrange(counted.count)
+                if i < self.sample_size:
+                    sample[i] = index
+            path = pair[0]
+            examples = self.examples.get(path)
+            if examples is None:
+                examples = self.examples[path] = []
+            if len(examples) < self.examples_size and \
+                   (not examples or examples[-1] != index):
+                examples.append(index)
+
+    def consume(self, results):
+        """
+        adds the errors of the (index, result, errors) tuples from
+        Schema.validate_many() or validate_parallel(), and yields the
+        (index, result) pairs of the valid records.
+        """
+        for index, result, errors in results:
+            self.add(index, errors)
+            if errors is None:
+                yield index, result
+
+    def most_common(self, n=None):
+        """
+        returns a list of ((path, message), ErrorCount) pairs, the
+        most frequent errors first.
+        """
+        items = sorted(self.counts.iteritems(),
+                       key=lambda item: -item[1].count)
+        if n is not None:
+            items = items[:n]
+        return items
+
+    def report(self, n=None):
+        """
+        returns a summary of the errors as text: a line for each of
+        the n most common, giving the first records with an error in
+        its field and a sample of the records with that error.
+        """
+        lines = ['%d records, %d invalid' % (self.records, self.invalid)]
+        for (path, message), counted in self.most_common(n):
+            lines.append('%8d  %s: %s (first records %s; e.g. records %s)' % (
+                counted.count,
+                '.'.join(str(k) for k in path) or '-',
+                message,
+                ', '.join(str(i) for i in self.examples.get(path, ())),
+                ', '.join(str(i) for i in sorted(counted.sample))))
+        if self.overflow:
+            lines.append('%8d  other errors' % self.overflow)
+        return '\n'.join(lines)
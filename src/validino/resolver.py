@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+DNS lookups for email(check_dns=True).
+
+A resolver is any object with a method lookup(domain), which returns
+a tuple of the list of the mail hosts of the domain (its MX records
+or, failing those, its A records; empty if there are none) and the
+number of seconds that answer may be cached for (or None if it is not
+known), and raises ResolverError if the lookup itself fails.
+
+PyDNSResolver queries name servers through pyDNS, with a timeout.
+CachingResolver wraps another resolver with a cache of the answers,
+found and not found, which expire with their time to live, and makes
+concurrent lookups of the same domain share a single query.  email
+validators use the resolver they are given, or else the one returned
+by default_resolver(): a CachingResolver around a PyDNSResolver,
+unless another was installed with set_default_resolver().
+"""
+
+import socket
+import sys
+import threading
+import time
+
+try:
+    import DNS
+except ImportError:
+    DNS = None
+
+from validino.util import LRUCache
+
+__all__ = [
+    'CachingResolver',
+    'PyDNSResolver',
+    'ResolverError',
+    'default_resolver',
+    'set_default_resolver']
+
+
+class ResolverError(Exception):
+    """
+    raised when a domain could not be looked up, as opposed to being
+    found to have no mail hosts.
+    """
+
+
+class PyDNSResolver(object):
+    """
+    looks domains up with pyDNS, asking servers (a list of addresses,
+    by default those of the system, found on the first lookup) on
+    port, and giving up on a query after timeout seconds.
+    """
+
+    def __init__(self, timeout=5, servers=None, port=53):
+        if DNS is None:
+            raise RuntimeError, "pyDNS not installed, cannot check DNS"
+        self.timeout = timeout
+        self.servers = servers
+        self.port = port
+
+    def _servers(self):
+        if self.servers:
+            return list(self.servers)
+        with _lock:
+            if not DNS.defaults['server']:
+                try:
+                    DNS.DiscoverNameServers()
+                except IOError, e:
+                    raise ResolverError('no name servers: %s' % e)
+        return DNS.defaults['server']
+
+    def lookup(self, domain):
+        servers = self._servers()
+        try:
+            for qtype in ('mx', 'a'):
+                answers = DNS.DnsRequest(domain,
+                                         qtype=qtype,
+                                         server=servers,
+                                         port=self.port,
+                                         timeout=self.timeout).req().answers
+                if answers:
+                    break
+        except (socket.error, DNS.DNSError), e:
+            raise ResolverError('%s: %s' % (domain, e))
+        hosts = []
+        for answer in answers:
+            data = answer['data']
+            if isinstance(data, tuple):
+                # (preference, exchange) for MX records
+                data = data[1]
+            hosts.append(data)
+        ttl = None
+        if answers:
+            ttl = min(answer['ttl'] for answer in answers)
+        return hosts, ttl
+
+
+class _Lookup(object):
+    """
+    a lookup in progress, which other threads can wait for.
+    """
+    __slots__ = ('_event', '_outcome')
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._outcome = None
+
+    def finish(self, ok, value):
+        self._outcome = (ok, value)
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        ok, value = self._outcome
+        if ok:
+            return value
+        raise value[0], value[1], value[2]
+
+
+class CachingResolver(object):
+    """
+    caches the answers of resolver, in an LRU cache of at most maxsize
+    domains (None for no limit).
+
+    An answer is kept for as long as its time to live, but no longer
+    than max_ttl seconds, or for default_ttl seconds if it has none.
+    Domains without mail hosts are kept for negative_ttl seconds at
+    most.  Failed lookups are not cached.  Domains are compared
+    without regard to case.  While a domain is being looked up, other
+    threads looking it up wait for that lookup instead of starting
+    their own.
+
+    hits, misses and coalesced count the lookups answered from the
+    cache, those passed on to resolver, and those that waited for
+    another thread's.
+    """
+
+    def __init__(self, resolver, maxsize=1024, default_ttl=300,
+                 negative_ttl=60, max_ttl=86400):
+        self.resolver = resolver
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_ttl = max_ttl
+        self.hits = self.misses = self.coalesced = 0
+        self._cache = LRUCache(maxsize)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, domain):
+        key = domain.lower()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                expires, hosts = entry
+                now = time.time()
+                if expires > now:
+                    self.hits += 1
+                    return hosts, expires - now
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Lookup()
+                self.misses += 1
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+        if not owner:
+            return pending.wait()
+        try:
+            try:
+                hosts, ttl = self.resolver.lookup(domain)
+            except:
+                pending.finish(False, sys.exc_info())
+                raise
+            if ttl is None:
+                ttl = self.default_ttl
+            ttl = min(ttl, self.max_ttl)
+            if not hosts:
+                ttl = min(ttl, self.negative_ttl)
+            if ttl > 0:
+                self._cache.put(key, (time.time() + ttl, hosts))
+            pending.finish(True, (hosts, ttl))
+        finally:
+            with self._lock:
+                del self._pending[key]
+        return hosts, ttl
+
+    def clear(self):
+        self._cache.clear()
+
+
+_lock = threading.Lock()
+_default = None
+
+
+def default_resolver():
+    """
+    returns the resolver of the email validators that were not given
+    one, creating a CachingResolver around a PyDNSResolver the first
+    time if none was installed.
+    """
+    global _default
+    if _default is None:
+        with _lock:
+            if _default is None:
+                _default = CachingResolver(PyDNSResolver())
+    return _default
+
+
+def set_default_resolver(resolver):
+    """
+    makes resolver the one used by the email validators that were not
+    given one; None restores the default.
+    """
+    global _default
+    _default = resolver
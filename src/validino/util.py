@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import collections
+import sys
+import threading
+import time
 from functools import wraps
 
 try:
@@ -11,3 +15,253 @@ except ImportError:
             d.update(_kw)
             return func(*(args + _args), **d)
         return inner
+
+
+def freeze(value, typed=False):
+    """
+    returns a hashable equivalent of value, turning dictionaries,
+    lists and sets (recursively) into frozensets and tuples.  If typed
+    is true, each value is paired with its type, so that values which
+    compare equal but are of different types (such as 1, 1.0 and
+    True, or a list and a tuple) are frozen differently.
+    """
+    if isinstance(value, dict):
+        frozen = frozenset((k, freeze(v, typed))
+                           for k, v in value.iteritems())
+    elif isinstance(value, (list, tuple)):
+        frozen = tuple(freeze(v, typed) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        frozen = frozenset(freeze(v, typed) for v in value)
+    else:
+        frozen = value
+    if typed:
+        return (type(value), frozen)
+    return frozen
+
+
+# the most values intern_value() keeps in a table
+INTERN_LIMIT = 100000
+
+
+def intern_value(value, table):
+    """
+    returns the first value equal to value that was passed in with
+    table, a dictionary, so that equal values (messages, paths, whole
+    sets of errors) kept in large numbers share a single object.
+    Unhashable values are returned as they are, as is everything once
+    table holds INTERN_LIMIT values.
+
+    The table keeps every distinct value it holds alive for as long as
+    it is kept itself, so it should belong to a batch of records (as
+    it does to a call of validate_many() or an ErrorCollector) and be
+    dropped with it, rather than live as long as the process.
+    """
+    try:
+        shared = table.get(value)
+    except TypeError:
+        return value
+    if shared is None:
+        if len(table) >= INTERN_LIMIT:
+            return value
+        shared = table.setdefault(value, value)
+    elif type(shared) is not type(value):
+        # equal but of another type, such as u'x' for 'x'
+        return value
+    return shared
+
+
+def compact_errors(errors, table=None):
+    """
+    turns a dictionary of unpacked errors into a sorted tuple of
+    (path, message) pairs, where path is the tuple of keys leading to
+    the message, without the None keys of the schemas' own messages.
+    The pairs, and the tuple, are shared with the others interned in
+    table (see intern_value()), if it is given.
+
+    >>> compact_errors({None: 'bad', 'x': {'y': 'too long', None: 'bad'}})
+    (((), 'bad'), (('x',), 'bad'), (('x', 'y'), 'too long'))
+    """
+    if table is None:
+        table = {}
+    pairs = []
+    stack = [((), errors)]
+    while stack:
+        path, errors = stack.pop()
+        for k, message in errors.iteritems():
+            if k is not None:
+                k = path + (k,)
+            else:
+                k = path
+            if isinstance(message, dict):
+                stack.append((k, message))
+            else:
+                pairs.append(intern_value((intern_value(k, table),
+                                           intern_value(message, table)),
+                                          table))
+    pairs.sort()
+    return intern_value(tuple(pairs), table)
+
+
+CacheInfo = collections.namedtuple('CacheInfo',
+                                   'hits misses maxsize currsize')
+
+# the fields of the links in LRUCache's list
+_PREV, _NEXT, _KEY, _VALUE, _EXPIRES = range(5)
+
+
+class LRUCache(object):
+    """
+    a thread-safe mapping of at most maxsize entries (any number if
+    maxsize is None), which discards the least recently used entry to
+    make room for a new one.  If ttl is given, entries also expire ttl
+    seconds after they were stored.  hits and misses count the calls
+    to get() that did and did not find an entry.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._links = {}
+        # a circular doubly linked list of [prev, next, key, value,
+        # expires] links, from the least to the most recently used
+        root = self._root = []
+        root[:] = [root, root, None, None, None]
+
+    def _unlink(self, link):
+        prev, next = link[_PREV], link[_NEXT]
+        prev[_NEXT] = next
+        next[_PREV] = prev
+
+    def _append(self, link):
+        root = self._root
+        last = root[_PREV]
+        last[_NEXT] = root[_PREV] = link
+        link[_PREV] = last
+        link[_NEXT] = root
+
+    def get(self, key, default=None):
+        with self._lock:
+            link = self._links.get(key)
+            if link is not None:
+                expires = link[_EXPIRES]
+                if expires is None or expires > time.time():
+                    self._unlink(link)
+                    self._append(link)
+                    self.hits += 1
+                    return link[_VALUE]
+                self._unlink(link)
+                del self._links[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.ttl is None:
+            expires = None
+        else:
+            expires = time.time() + self.ttl
+        with self._lock:
+            links = self._links
+            link = links.pop(key, None)
+            if link is not None:
+                self._unlink(link)
+            elif self.maxsize is not None and len(links) >= self.maxsize:
+                if not self.maxsize:
+                    return
+                oldest = self._root[_NEXT]
+                self._unlink(oldest)
+                del links[oldest[_KEY]]
+            link = [None, None, key, value, expires]
+            self._append(link)
+            links[key] = link
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """
+        returns a CacheInfo of the hits, misses, maximum and current
+        size of the cache.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self._links))
+
+    def __len__(self):
+        return len(self._links)
+
+
+class Call(object):
+    """
+    runs func(*args) in a new daemon thread, holding semaphore (if it
+    is not None) while it does.  get() waits for it to finish, then
+    returns its result or raises the exception it raised.
+    """
+    __slots__ = ('_thread', '_outcome')
+
+    def __init__(self, func, args=(), semaphore=None):
+        self._outcome = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(func, args, semaphore))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args, semaphore):
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            self._outcome = (True, func(*args))
+        except:
+            self._outcome = (False, sys.exc_info())
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    def get(self):
+        self._thread.join()
+        ok, value = self._outcome
+        if ok:
+            return value
+        raise value[0], value[1], value[2]
+
+
+def threaded(limit=None):
+    """
+    returns a function submit(func, args) which runs func(*args) in a
+    thread of its own, at most limit of them at a time (any number if
+    limit is None), returning a Call.
+    """
+    semaphore = limit is not None and threading.BoundedSemaphore(limit) \
+                or None
+    def submit(func, args=()):
+        return Call(func, args, semaphore)
+    return submit
+
+
+class FutureCall(object):
+    """
+    adapts a concurrent.futures Future to the get() method of Call.
+    """
+    __slots__ = ('future',)
+
+    def __init__(self, future):
+        self.future = future
+
+    def get(self):
+        return self.future.result()
+
+
+def future_submitter(executor):
+    """
+    returns a function submit(func, args) which runs func(*args) with
+    executor, a concurrent.futures Executor, returning a FutureCall.
+    """
+    def submit(func, args=()):
+        return FutureCall(executor.submit(func, *args))
+    return submit
@@ -957,3 +957,807 @@ def test_errors():
 
     result = e.value.unpack_errors()
     assert result == expected
+
+
+def test_schema_compile():
+    validators = dict(
+        foo=(V.strip, V.to_integer()),
+        bar=V.default('bar'))
+    s = V.Schema(validators)
+    plan = s.compile()
+    assert s.compile() is plan
+    assert plan.keys == frozenset(('foo', 'bar'))
+    assert s(dict(foo=' 1 ')) == dict(foo=1, bar='bar')
+    assert s.compile() is plan
+
+    # in-place changes are only seen after invalidate()
+    validators['baz'] = V.default('baz')
+    assert s(dict(foo='1')) == dict(foo=1, bar='bar')
+    s.invalidate()
+    assert s(dict(foo='1')) == dict(foo=1, bar='bar', baz='baz')
+
+    # assigning new subvalidators discards the plan
+    s.subvalidators = dict(foo=V.to_integer())
+    assert s.compile() is not plan
+    assert s(dict(foo='2', bar='x')) == dict(foo=2)
+
+
+def test_schema_compile_plural_keys():
+    s = V.Schema({
+        'foo': V.to_integer(),
+        ('foo', 'bar'): V.fields_equal('not equal')},
+        allow_missing=False)
+    plan = s.compile()
+    assert plan.plural_keys == (('foo', 'bar'),)
+    assert s._keys() == set(('foo', 'bar'))
+    assert s(dict(foo='1', bar=1)) == dict(foo=1, bar=1)
+    assert_invalid(
+        lambda: s(dict(foo='1')),
+        {None: 'missing keys in input'})
+
+
+def test_schema_plan_dependencies():
+    s = V.Schema({
+        u'b': V.strip,
+        'a': V.strip,
+        ('a', 'c'): V.fields_equal('a c'),
+        ('a', 'b'): V.fields_equal('a b'),
+        ('d', 'e'): V.fields_equal('d e')})
+    plan = s.compile()
+    assert [step[0] for step in plan.steps] == [
+        'a', u'b', ('a', 'b'), ('a', 'c'), ('d', 'e')]
+    assert plan.dependents == {
+        'a': (('a', 'b'), ('a', 'c')),
+        'b': (('a', 'b'),),
+        'c': (('a', 'c'),),
+        'd': (('d', 'e'),),
+        'e': (('d', 'e'),)}
+
+
+def test_schema_skips_failed_dependents():
+    s = V.Schema({
+        'email': V.not_empty('empty email'),
+        ('email', 'confirm'): V.fields_equal('no match', field='confirm'),
+        ('confirm', 'other'): V.fields_equal('unused')})
+    assert_invalid(
+        lambda: s(dict(email='', confirm='x', other='x')),
+        {None: 'Problems were found in the submitted data.',
+         'email': 'empty email'})
+    # a failed plural key also stops the plural keys sharing its fields
+    assert_invalid(
+        lambda: s(dict(email='x', confirm='y', other='y')),
+        {None: 'Problems were found in the submitted data.',
+         'confirm': 'no match'})
+    assert s(dict(email='x', confirm='x', other='x')) == dict(
+        email='x', confirm='x', other='x')
+
+
+def test_schema_validate_many():
+    s = V.Schema({
+        'foo': V.to_integer(msg='not an integer'),
+        'bar': V.nested(flim=V.is_integer(msg='flim')),
+        ('foo', 'baz'): V.fields_equal('foo and baz', field=None)},
+        msg='schema')
+    data = [
+        dict(foo='1', bar=dict(flim=1), baz=1),
+        dict(foo='one', bar=dict(flim='x'), baz='one'),
+        dict(foo='1', bar=dict(flim=1), baz=2),
+        ]
+    results = list(s.validate_many(iter(data)))
+    assert [r[0] for r in results] == [0, 1, 2]
+    assert results[0][1:] == (dict(foo=1, bar=dict(flim=1), baz=1), None)
+    assert results[1][1:] == (None, {None: 'schema',
+                                     'foo': 'not an integer',
+                                     'bar': {'flim': 'flim'}})
+    assert results[2][1:] == (None, {None: 'foo and baz'})
+    for (index, result, errors), d in zip(results, data):
+        try:
+            s(d)
+        except V.Invalid, e:
+            assert errors == e.unpack_errors()
+
+    s = V.Schema(dict(foo=V.to_integer()), allow_extra=False)
+    results = list(s.validate_many([dict(foo='1', bar=2)], context={}))
+    assert results == [(0, None, {None: 'extra keys in input'})]
+
+
+def test_schema_validate_many_is_lazy():
+    def records():
+        yield dict(foo='1')
+        raise AssertionError("read too far")
+    s = V.Schema(dict(foo=V.to_integer()))
+    results = s.validate_many(records())
+    assert results.next() == (0, dict(foo=1), None)
+
+
+def test_schema_revalidate():
+    calls = []
+    def counted(name):
+        def validator(value, context=None):
+            calls.append(name)
+            return value
+        return validator
+    s = V.Schema({
+        'a': (counted('a'), V.to_integer('a')),
+        'b': (counted('b'), V.strip),
+        'c': (counted('c'), V.to_integer('c')),
+        'd': counted('d'),
+        ('b', 'd'): (counted('bd'), V.fields_equal('b d', field='d'))},
+        msg='schema')
+    data = dict(a='1', b=' x ', c='2', d='x')
+    state = s.revalidate(None, data)
+    assert sorted(calls) == ['a', 'b', 'bd', 'c', 'd']
+    assert state.valid
+    assert state.errors is None
+    assert state.invalid() is None
+    assert state.result == s(data)
+
+    del calls[:]
+    data = dict(data, a='one')
+    state = s.revalidate(state, data)
+    assert calls == ['a']
+    assert state.errors == {None: 'schema', 'a': 'a'}
+    assert isinstance(state.invalid(), V.Invalid)
+
+    # changing a field reruns the plural keys that mention it
+    del calls[:]
+    data = dict(data, a='3', d='y')
+    state = s.revalidate(state, data)
+    assert sorted(calls) == ['a', 'b', 'bd', 'd']
+    assert state.errors == {None: 'schema', 'd': 'b d'}
+
+    del calls[:]
+    data['d'] = 'x'
+    state = s.revalidate(state, data, changed_keys=['d'])
+    assert sorted(calls) == ['b', 'bd', 'd']
+    assert state.result == dict(a=3, b='x', c=2, d='x') == s(data)
+
+    del calls[:]
+    assert s.revalidate(state, data).result == state.result
+    assert calls == []
+
+    # a recompiled schema validates everything again
+    s.invalidate()
+    s.revalidate(state, data)
+    assert len(calls) == 5
+
+
+def test_schema_revalidate_matches_call():
+    s = V.Schema({
+        'email': (V.strip, V.not_empty('empty')),
+        'confirm': V.strip,
+        'age': V.to_integer('age'),
+        ('email', 'confirm'): V.fields_equal('no match', field='confirm')},
+        filter_extra=False)
+    versions = [
+        dict(email=' a@b ', confirm='x', age='1', extra=1),
+        dict(email='', confirm='x', age='one', extra=2),
+        dict(email='x', confirm='x', age='one', extra=2),
+        dict(email='x', confirm='x', age='2'),
+        ]
+    state = None
+    for data in versions:
+        state = s.revalidate(state, dict(data))
+        assert state.data == data
+        try:
+            expected = s(dict(data))
+        except V.Invalid, e:
+            assert state.errors == e.unpack_errors()
+        else:
+            assert state.errors is None
+            assert state.result == expected
+
+
+def test_schema_validate_partial():
+    calls = []
+    def counted(value, context=None):
+        calls.append(value)
+        return value
+    validators = dict(('f%d' % i, (counted, V.to_integer('f%d' % i)))
+                      for i in range(200))
+    validators[('f1', 'f2')] = V.fields_equal('f1 f2', field=None)
+    validators[('f2', 'f3')] = V.only_one_of('unused')
+    s = V.Schema(validators, msg='schema', allow_missing=False)
+    assert s.validate_partial(dict(f7='7')) == dict(f7=7)
+    assert calls == ['7']
+    assert s.validate_partial(dict()) == dict()
+    assert_invalid(
+        lambda: s.validate_partial(dict(f1='1', f2='2')),
+        {None: 'f1 f2'})
+    assert_invalid(
+        lambda: s.validate_partial(dict(f1='x', f2='2')),
+        {None: 'schema', 'f1': 'f1'})
+    s = V.Schema(validators, allow_extra=False, filter_extra=False)
+    data = dict(f1='1', f2='1')
+    assert s.validate_partial(data) is data
+    assert data == dict(f1=1, f2=1)
+    assert_invalid(
+        lambda: s.validate_partial(dict(f1='1', g='2')),
+        {None: 'extra keys in input'})
+
+
+def test_memoize():
+    calls = []
+    def counted(value, context=None):
+        calls.append(value)
+        if value == 'bad':
+            raise V.Invalid('bad')
+        return value.upper()
+    v = V.memoize(counted, maxsize=2)
+    assert v('a') == 'A'
+    assert v('a') == 'A'
+    assert calls == ['a']
+    assert_invalid(lambda: v('bad'), {None: 'bad'})
+    assert_invalid(lambda: v('bad'), {None: 'bad'})
+    assert calls == ['a', 'bad']
+    # 'a' was used least recently, so it goes
+    v('c')
+    v('a')
+    assert calls == ['a', 'bad', 'c', 'a']
+    assert v.cache_info() == (2, 4, 2, 2)
+    v.cache_clear()
+    assert v.cache_info() == (0, 0, 2, 0)
+
+    v = V.memoize(V.to_integer(), maxsize=None)
+    assert v(1.5) == 1
+    assert v(u'1') == 1
+    assert v.cache_info().currsize == 2
+
+
+def test_memoize_failures_are_copied():
+    def fail(value, context=None):
+        raise V.Invalid({'a': 'bad'})
+    v = V.memoize(fail)
+    es = []
+    for i in range(3):
+        try:
+            v('x')
+        except V.Invalid, e:
+            assert e.unpack_errors() == {'a': 'bad'}
+            es.append(e)
+            e.errors['a'] = 'changed'
+    assert es[1] is not es[2]
+
+    v = V.memoize(V.credit_card(msg='bad'))
+    data = ('4111111111111112', 'Visa')
+    for i in range(3):
+        try:
+            v(data)
+        except V.Invalid, e:
+            errors = e.errors['cc_number']
+            assert errors == ['bad']
+            errors.append('more')
+        else:
+            assert False
+
+
+def test_memoize_ttl():
+    import time
+    calls = []
+    def counted(value, context=None):
+        calls.append(value)
+        return value
+    v = V.memoize(counted, ttl=0.05)
+    v('a')
+    v('a')
+    assert calls == ['a']
+    time.sleep(0.1)
+    v('a')
+    assert calls == ['a', 'a']
+
+
+def test_memoize_unhashable():
+    v = V.memoize(V.to_list())
+    assert v([1]) == [1]
+    assert v.cache_info().currsize == 0
+
+
+def test_pure_validators():
+    assert V.parse_date('%Y').pure
+    assert V.regex('a').pure
+    assert V.translate(dict(a=1)).pure
+    assert V.uuid().pure
+    assert not V.uuid(default=True).pure
+    assert V.email().pure
+    assert V.credit_card().pure
+    assert not V.to_list().pure
+    assert not V.all_of(V.regex('a')).pure
+
+
+def test_schema_cache():
+    s = V.Schema(
+        dict(date=(V.strip, V.parse_date('%Y-%m-%d', msg='date')),
+             code=V.regex('^[A-Z]{2}$', msg='code'),
+             n=V.to_integer()),
+        cache_size=10)
+    assert len(s.compile().caches) == 2
+    data = dict(date=' 2007-01-02 ', code='GB', n='1')
+    expected = s(data)
+    for i in range(5):
+        assert s(data) == expected
+    assert_invalid(lambda: s(dict(date='x', code='gb', n='1')),
+                   {None: 'Problems were found in the submitted data.',
+                    'date': 'date',
+                    'code': 'code'})
+    assert s.cache_info() == (10, 4, 20, 4)
+    assert V.Schema(dict(n=V.to_integer())).cache_info() == (0, 0, 0, 0)
+    s = V.Schema(dict(code=V.regex('^[A-Z]{2}$')), cache_size=None,
+                 codegen=True)
+    s(dict(code='GB'))
+    s(dict(code='GB'))
+    assert s.cache_info() == (1, 1, None, 1)
+
+
+def test_schema_record_cache():
+    calls = []
+    def counted(value, context=None):
+        calls.append(value)
+        if context and value not in context.get('allowed', (value,)):
+            raise V.Invalid('not allowed')
+        return value
+    s = V.Schema(dict(foo=counted, bar=V.to_integer('bar')),
+                 record_cache_size=2, context_keys=('allowed',))
+    assert s(dict(foo='a', bar='1')) == dict(foo='a', bar=1)
+    result = s(dict(foo='a', bar='1'))
+    assert result == dict(foo='a', bar=1)
+    assert calls == ['a']
+    # results are not shared
+    result['foo'] = 'changed'
+    assert s(dict(foo='a', bar='1')) == dict(foo='a', bar=1)
+    for i in range(2):
+        assert_invalid(lambda: s(dict(foo='a', bar='x')),
+                       {None: 'Problems were found in the submitted data.',
+                        'bar': 'bar'})
+    assert calls == ['a', 'a']
+    # equal values of different types are different records
+    s(dict(foo='a', bar=1))
+    s(dict(foo='a', bar=True))
+    assert calls == ['a', 'a', 'a', 'a']
+    # as are different values of the declared context keys
+    s(dict(foo='a', bar=1), dict(allowed=('a',), other=1))
+    s(dict(foo='a', bar=1), dict(allowed=('a',), other=2))
+    assert_invalid(lambda: s(dict(foo='a', bar=1), dict(allowed=('b',))),
+                   {None: 'Problems were found in the submitted data.',
+                    'foo': 'not allowed'})
+    assert len(calls) == 6
+    info = s.record_cache_info()
+    assert (info.maxsize, info.currsize) == (2, 2)
+    # unhashable input is always validated
+    s(dict(foo=bytearray('a'), bar=1))
+    s(dict(foo=bytearray('a'), bar=1))
+    assert len(calls) == 8
+    s.invalidate()
+    assert s.record_cache_info().currsize == 0
+    assert V.Schema(dict(foo=counted)).record_cache_info() is None
+
+
+def test_schema_record_cache_keys():
+    s = V.Schema(dict(foo=V.to_integer()), allow_extra=False,
+                 filter_extra=False, record_cache_size=None)
+    for i in range(2):
+        data = dict(foo='1')
+        assert s(data) is data
+        assert data == dict(foo=1)
+        assert_invalid(lambda: s(dict(foo='1', bar=2)),
+                       {None: 'extra keys in input'})
+    assert s.record_cache_info() == (2, 2, None, 2)
+    import pickle
+    s2 = pickle.loads(pickle.dumps(s))
+    assert s2 == s
+    assert s2.record_cache_info() == (0, 0, None, 0)
+
+
+def _lookups():
+    """
+    returns an I/O-bound validator which waits a little, and a list
+    holding the number of its calls in progress and the most there
+    were at once.
+    """
+    import threading, time
+    lock = threading.Lock()
+    counts = [0, 0]
+    def lookup(value, context=None):
+        with lock:
+            counts[0] += 1
+            counts[1] = max(counts)
+        time.sleep(0.05)
+        with lock:
+            counts[0] -= 1
+        if value == 'bad':
+            raise V.Invalid('not found')
+        return value.upper()
+    lookup.io_bound = True
+    return lookup, counts
+
+
+def test_io_bound_validators():
+    assert not V.email().io_bound
+    assert V.url(check_exists=True).io_bound
+    assert V.all_of(V.strip, V.url(check_exists=True)).io_bound
+    assert V.memoize(V.url(check_exists=True)).io_bound
+    assert not V.all_of(V.strip, V.not_empty()).io_bound
+    lookup, counts = _lookups()
+    s = V.Schema(dict(a=(V.strip, lookup), b=V.to_integer()))
+    assert s.compile().io_keys == frozenset(['a'])
+    assert s.io_bound
+    assert not V.Schema(dict(b=V.to_integer())).io_bound
+
+
+def test_schema_validate_concurrent():
+    lookup, counts = _lookups()
+    s = V.Schema({'a': lookup, 'b': lookup, 'c': lookup,
+                  'n': V.to_integer('n'),
+                  ('a', 'n'): lambda v, context: v},
+                 msg='bad')
+    data = dict(a='x', b='y', c='z', n='1')
+    assert s.validate_concurrent(data) == s(data)
+    assert counts[1] == 3
+    counts[1] = 0
+    assert s.validate_concurrent(data, limit=1) == s(data)
+    assert counts[1] == 1
+    bad = dict(a='bad', b='y', c='bad', n='x')
+    assert_invalid(lambda: s.validate_concurrent(bad),
+                   {None: 'bad', 'a': 'not found', 'c': 'not found',
+                    'n': 'n'})
+    s.fail_fast = True
+    assert_invalid(lambda: s.validate_concurrent(bad),
+                   {None: 'bad', 'a': 'not found'})
+    # other exceptions are raised in the calling thread
+    s = V.Schema(dict(a=lookup, b=lookup))
+    with py.test.raises(AttributeError):
+        s.validate_concurrent(dict(a=1, b='y'))
+
+
+def test_schema_executor():
+    from multiprocessing.pool import ThreadPool
+    lookup, counts = _lookups()
+    def in_database(value, context):
+        lookup(value)
+        if value not in context['database']:
+            raise V.Invalid('not in the database')
+        return value
+    in_database.io_bound = True
+    subvalidators = dict(a=lookup, b=lookup, user=in_database,
+                         n=V.to_integer('n'))
+    context = dict(database=['bob'])
+    data = dict(a='x', b='y', user='bob', n='1')
+    expected = V.Schema(subvalidators)(data, context)
+    pool = ThreadPool(4)
+    try:
+        s = V.Schema(subvalidators, executor=pool)
+        assert s(data, context) == expected
+        assert counts[1] == 3
+        assert_invalid(lambda: s(dict(data, user='al', b='bad'), context),
+                       {None: 'Problems were found in the submitted data.',
+                        'b': 'not found',
+                        'user': 'not in the database'})
+        assert list(s.validate_many([data], context)) == \
+               [(0, expected, None)]
+
+        # and with the submit() of concurrent.futures executors
+        class Future(object):
+            def __init__(self, result):
+                self.result = result.get
+        class Executor(object):
+            def submit(self, func, *args):
+                return Future(pool.apply_async(func, args))
+        counts[1] = 0
+        s = V.Schema(subvalidators, executor=Executor())
+        assert s(data, context) == expected
+        assert counts[1] == 3
+
+        # the executor is neither pickled nor compared
+        import pickle
+        s = V.Schema(dict(n=V.to_integer()), executor=pool)
+        s2 = pickle.loads(pickle.dumps(s))
+        assert s2.executor is None
+        assert s2 == s == V.Schema(dict(n=V.to_integer()))
+        assert hash(s) == hash(s2)
+        assert s2(dict(n='1')) == dict(n=1)
+    finally:
+        pool.terminate()
+
+    from multiprocessing import Pool
+    pool = Pool(1)
+    try:
+        with py.test.raises(TypeError):
+            V.Schema(subvalidators, executor=pool)
+    finally:
+        pool.terminate()
+
+
+def test_schema_validate_stream():
+    import Queue, time
+    lookup, counts = _lookups()
+    s = V.Schema(dict(a=lookup, n=V.to_integer()))
+    records = [dict(a='x', n=str(i)) for i in range(12)]
+    records[3]['a'] = 'bad'
+    expected = list(s.validate_many(records))
+    assert list(s.validate_stream(records, concurrency=4)) == expected
+    assert counts[1] == 4
+    unordered = list(s.validate_stream(records, ordered=False))
+    assert sorted(unordered) == expected
+    assert list(s.validate_stream(records, compact=True))[3][2] == \
+           (((), 'Problems were found in the submitted data.'),
+            (('a',), 'not found'))
+
+    # a record held up does not hold up the others when unordered
+    def slow(value, context=None):
+        if value == 'slow':
+            time.sleep(0.2)
+        return value
+    s = V.Schema(dict(a=slow))
+    records = [dict(a='slow'), dict(a='x'), dict(a='y')]
+    assert [i for i, r, e in s.validate_stream(records, 3,
+                                               ordered=False)] == [1, 2, 0]
+    assert [i for i, r, e in s.validate_stream(records, 3)] == [0, 1, 2]
+
+    # records are only taken from the source as results are consumed,
+    # here an in-memory queue standing in for a message broker
+    source = Queue.Queue()
+    for i in range(10):
+        source.put(dict(a=str(i)))
+    def consume():
+        while not source.empty():
+            yield source.get()
+    stream = s.validate_stream(consume(), concurrency=2)
+    assert stream.next() == (0, dict(a='0'), None)
+    assert source.qsize() == 8
+    stream.close()
+
+    s = V.Schema(dict(a=lookup))
+    with py.test.raises(AttributeError):
+        list(s.validate_stream([dict(a='x'), dict(a=1)]))
+    for concurrency in (0, -1):
+        py.test.raises(ValueError, s.validate_stream, [dict(a='x')],
+                       concurrency=concurrency)
+
+
+def test_schema_record_cache_copies():
+    s = V.Schema(dict(n=V.nested(x=V.to_integer('x'))), record_cache_size=10)
+    r1 = s(dict(n=dict(x='1')))
+    r1['n']['x'] = 999
+    r2 = s(dict(n=dict(x='1')))
+    assert r2 == dict(n=dict(x=1))
+    r2['n']['x'] = 998
+    assert s(dict(n=dict(x='1'))) == dict(n=dict(x=1))
+    errors = []
+    for i in range(3):
+        try:
+            s(dict(n=dict(x='y')))
+        except V.Invalid, e:
+            errors.append(e)
+    assert errors[1] is not errors[2]
+    errors[1].errors['n'] = 'changed'
+    assert errors[2].unpack_errors() == errors[0].unpack_errors()
+    assert errors[2].unpack_errors()['n'] != 'changed'
+
+
+def test_validator_params():
+    v = V.clamp(min=1, max=10, msg='out of range')
+    assert v.params == dict(min=1, max=10, msg='out of range')
+    assert v.min == 1
+    assert V.all_of(V.strip, v).params == dict(validators=(V.strip, v))
+    assert V.parse_date('%Y').params == dict(format='%Y', msg=None)
+    assert repr(V.belongs([1, 2])) == "belongs(domain=[1, 2], msg=None)"
+    with py.test.raises(AttributeError):
+        v.colour = 'blue'
+
+
+def test_validator_equality():
+    assert V.clamp(min=1) == V.clamp(min=1)
+    assert V.clamp(min=1) != V.clamp(min=2)
+    assert V.clamp(min=1) != V.clamp_length(min=1)
+    assert V.belongs([1, 2], msg=dict(belongs='no')) == \
+        V.belongs([1, 2], msg=dict(belongs='no'))
+    assert hash(V.belongs([1, 2])) == hash(V.belongs([1, 2]))
+    assert len(set([V.not_empty(), V.not_empty(), V.empty()])) == 2
+    s1 = V.Schema(dict(foo=(V.strip, V.to_integer())))
+    s2 = V.Schema(dict(foo=(V.strip, V.to_integer())))
+    assert s1 == s2
+    assert hash(s1) == hash(s2)
+    assert s1 != V.Schema(dict(foo=(V.strip, V.to_integer())), msg='x')
+
+
+def test_validator_pickle():
+    import pickle
+    s = V.Schema(
+        {'foo': (V.strip, V.to_integer(), V.clamp(min=1, max=10)),
+         'bar': V.either(V.empty(), V.belongs(['a', 'b'])),
+         'baz': V.nested(flim=V.parse_date('%Y-%m-%d')),
+         ('foo', 'bar'): V.only_one_of('eek')},
+        msg='schema',
+        allow_extra=False,
+        codegen=True)
+    s.compile()
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        s2 = pickle.loads(pickle.dumps(s, protocol))
+        assert s2 == s
+        assert s2.params == s.params
+        data = dict(foo=' 3 ', bar='', baz=dict(flim='2007-01-02'))
+        assert s2(data) == s(data)
+        v = pickle.loads(pickle.dumps(V.fields_equal('eek'), protocol))
+        assert v.field is V.base._default
+
+
+def test_either_reraises_last_exception():
+    class MyInvalid(V.Invalid):
+        pass
+    error = MyInvalid("mine")
+    def raise_mine(value, context=None):
+        raise error
+    def raise_type_error(value, context=None):
+        raise TypeError(value)
+    v = V.either(V.to_integer(), raise_mine)
+    with py.test.raises(MyInvalid) as e:
+        v('x')
+    assert e.value is error
+    v = V.either(raise_mine, raise_type_error)
+    with py.test.raises(TypeError):
+        v('x')
+    v = V.either(raise_type_error, V.to_integer('int'))
+    assert v('1') == 1
+    assert_invalid(lambda: v('x'), {None: 'int'})
+
+
+def test_validator_subclass():
+    class shout(V.Validator):
+        __slots__ = ()
+        def __call__(self, value, context=None):
+            if not value:
+                raise V.Invalid("say something", field='other')
+            return value.upper()
+    v = shout()
+    assert V.all_of(V.strip, v)(' hi ') == 'HI'
+    assert V.either(V.empty(), v)('hi') == 'HI'
+    s = V.Schema(dict(foo=v, bar=(V.strip, v)))
+    assert s(dict(foo='a', bar=' b ')) == dict(foo='A', bar='B')
+    assert_invalid(
+        lambda: s(dict(foo='a', bar=' ')),
+        {None: "Problems were found in the submitted data.",
+         'other': "say something"})
+
+    class silent(V.Validator):
+        __slots__ = ()
+    with py.test.raises(NotImplementedError) as e:
+        silent()('x')
+    assert 'silent' in str(e.value)
+
+
+def test_field():
+    f = V.Field(V.to_integer('int'), V.clamp(max=5, msg='big'))
+    assert f('') == ''
+    assert f('3') == 3
+    assert_invalid(lambda: f('6'), {None: 'big'})
+    f = V.Field(V.to_integer('int'), required=True)
+    assert_invalid(lambda: f(''), {None: 'int'})
+
+
+def _reference_unpack(errors):
+    # the original recursive unpacker, for comparison
+    def unpack_error(name, error):
+        if isinstance(error, dict):
+            result = dict(
+                [unpack_error(key, value) for (key, value) in error.iteritems()])
+        elif isinstance(error, (list, tuple)):
+            name, result = unpack_error(name, error[0])
+        elif isinstance(error, V.Invalid):
+            name = getattr(error, 'field', name)
+            result = unpack_errors(error.errors)
+        else:
+            result = error
+        return (name, result)
+    def unpack_errors(errors):
+        result = dict(unpack_error(k, v) for k, v in errors.iteritems())
+        if result.keys() == [None]:
+            return result[None]
+        elif result.keys() == ['']:
+            return result['']
+        return result
+    return unpack_errors(errors)
+
+
+def test_unpack_matches_recursive_unpacker():
+    structures = [
+        "flat",
+        {'a': 'b', None: 'c'},
+        {None: V.Invalid({'': [V.Invalid('deep')]})},
+        {'x': [V.Invalid('first'), V.Invalid('second')],
+         'y': ({'': 'kept', None: 'also kept'},)},
+        {'x': V.Invalid({'z': 'renamed'}, field='w'),
+         'v': V.Invalid(V.Invalid(None)),
+         'u': V.Invalid({None: V.Invalid('inner', field='t')})},
+        {'': {'a': [[V.Invalid({'b': V.Invalid('c', field=None)})]]}},
+        ]
+    for errors in structures:
+        e = V.Invalid(errors)
+        assert e._unpack_errors() == _reference_unpack(e.errors)
+
+
+def test_unpack_deeply_nested():
+    import sys
+    depth = sys.getrecursionlimit() * 2
+    error = V.Invalid('bottom')
+    for i in xrange(depth):
+        error = V.Invalid({'level': error})
+    result = error.unpack_errors()
+    for i in xrange(depth):
+        result = result['level']
+    assert result == 'bottom'
+
+
+def test_Invalid_is_lazy():
+    e = V.Invalid("foo")
+    assert e._errors == "foo"
+    assert str(e) == "{None: 'foo'}"
+    assert e.errors == {None: "foo"}
+    e.errors[None] = "bar"
+    assert e.unpack_errors() == {None: "bar"}
+    assert V.Invalid().errors == {}
+    assert V.Invalid('').unpack_errors() == {}
+
+    schema = V.Schema(dict(foo=V.nested(bar=V.is_integer('int'))))
+    with py.test.raises(V.Invalid) as e:
+        schema(dict(foo=dict(bar='x')))
+    assert isinstance(e.value._errors['foo'], V.base._Failure)
+    assert e.value.errors['foo'] == {'bar': 'int'}
+
+
+def test_Invalid_pickle():
+    import pickle
+    e = V.Invalid(dict(foo=V.Invalid('bar')), field='baz')
+    e2 = pickle.loads(pickle.dumps(e, 2))
+    assert e2.field == 'baz'
+    assert e2.unpack_errors() == {'foo': 'bar'}
+    e2 = pickle.loads(pickle.dumps(V.Invalid('bar')))
+    assert not hasattr(e2, 'field')
+    assert e2.errors == {None: 'bar'}
+
+
+def test_schema_fail_fast():
+    calls = []
+    def expensive(value, context=None):
+        calls.append(value)
+        return value
+    validators = {
+        'a': V.to_integer('a'),
+        'b': V.to_integer('b'),
+        'c': expensive,
+        ('a', 'c'): expensive}
+    s = V.Schema(validators, msg='schema', fail_fast=True)
+    assert s(dict(a='1', b='2', c=3)) == dict(a=1, b=2, c=3)
+    assert calls == [3, (1, 3)]
+    del calls[:]
+    assert_invalid(
+        lambda: s(dict(a='x', b='y', c=3)),
+        {None: 'schema', 'a': 'a'})
+    assert calls == []
+
+    # without fail_fast, or with it in the context
+    s = V.Schema(validators, msg='schema')
+    assert_invalid(
+        lambda: s(dict(a='x', b='y', c=3)),
+        {None: 'schema', 'a': 'a', 'b': 'b'})
+    context = {V.FAIL_FAST: True}
+    assert_invalid(
+        lambda: s(dict(a='x', b='y', c=3), context),
+        {None: 'schema', 'a': 'a'})
+
+
+def test_nested_fail_fast():
+    v = V.nested(a=V.is_integer('a'), b=V.is_integer('b'))
+    with py.test.raises(V.Invalid) as e:
+        v(dict(a='x', b='y'), {V.FAIL_FAST: True})
+    assert len(e.value.unpack_errors()) == 1
+    v = V.nested_many(V.is_integer('int'))
+    with py.test.raises(V.Invalid) as e:
+        v(dict(a='x', b='y', c=1), {V.FAIL_FAST: True})
+    assert e.value.unpack_errors().values() == ['int']
+
+    context = dict(other=1)
+    s = V.Schema(dict(foo=V.nested(a=V.is_integer('a'), b=V.is_integer('b'))),
+                 fail_fast=True)
+    with py.test.raises(V.Invalid) as e:
+        s(dict(foo=dict(a='x', b='y')), context)
+    assert len(e.value.unpack_errors()['foo']) == 1
+    assert context == dict(other=1)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'benchmarks'))
+
+import suite
+
+
+def result(name, samples):
+    samples = sorted(samples)
+    return dict(name=name, samples=samples,
+                median=samples[len(samples) // 2])
+
+
+def test_slower_p_value():
+    # u = 0: every current sample is below every baseline sample
+    p = suite.slower_p_value([4, 5, 6], [1, 2, 3])
+    assert abs(p - 0.0404) < 1e-4
+    # and the other way round
+    assert suite.slower_p_value([1, 2, 3], [4, 5, 6]) > 0.95
+    # identical samples are no evidence at all
+    assert suite.slower_p_value([5, 5, 5], [5, 5, 5]) == 1.0
+    assert suite.slower_p_value([], [1, 2]) == 1.0
+
+
+def test_slower_p_value_ties():
+    # u = 0.5, with three pairs of ties: the variance drops from 5.25
+    # to 4.8, and the p-value with it
+    p = suite.slower_p_value([2, 3, 3], [1, 1, 2])
+    assert abs(p - 0.0551) < 1e-4
+
+
+def test_compare():
+    baseline = dict(results=dict(
+        (r['name'], r) for r in [result('schema.small', [100, 101, 102]),
+                                 result('regex.url', [100, 101, 102]),
+                                 result('misc.x', [100, 101, 102])]))
+    results = [result('schema.small', [80, 81, 82]),
+               result('regex.url', [99, 100, 101]),
+               result('misc.x', [80, 81, 82]),
+               result('schema.new', [1, 2, 3])]
+    assert suite.compare(baseline, results) == ['schema.small']
+    assert suite.compare(baseline, results, groups=('misc',)) == ['misc.x']
+    assert suite.compare(baseline, results, threshold=0.5) == []
+    assert suite.compare(baseline, results, alpha=0.01) == []
+
+
+def test_save_merge(tmpdir):
+    path = str(tmpdir.join('baseline.json'))
+    suite.save([result('a', [1]), result('b', [2])], path)
+    suite.save([result('b', [3])], path, merge=True)
+    saved = suite.load(path)['results']
+    assert sorted(saved) == ['a', 'b']
+    assert saved['b']['samples'] == [3]
+    suite.save([result('b', [4])], path)
+    assert sorted(suite.load(path)['results']) == ['b']
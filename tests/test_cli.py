@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+from StringIO import StringIO
+
+import pytest
+
+import validino as V
+from validino.cli import main
+
+
+schema = V.Schema(dict(
+    name=(V.strip, V.not_empty('name')),
+    age=V.to_integer('age'),
+    joined=V.either(V.empty(), V.parse_date('%Y-%m-%d', 'joined'))),
+    msg='bad record')
+
+
+# set to a name to make crashing fail with a RuntimeError on it
+crash_on = []
+
+
+def _crash(value, context=None):
+    if value in crash_on:
+        raise RuntimeError('crash')
+    return value
+
+
+crashing = V.Schema(dict(
+    name=(_crash, V.strip, V.not_empty('name')),
+    age=V.to_integer('age'),
+    joined=V.either(V.empty(), V.parse_date('%Y-%m-%d', 'joined'))),
+    msg='bad record')
+
+
+JSONL = '''\
+{"name": " bob ", "age": "3", "joined": "2007-01-02"}
+{"name": "", "age": "x"}
+
+{"name": "jim", "age": "4"}
+'''
+
+CSV = '''\
+name,age,joined
+bob,3,2007-01-02
+,x,
+jim,4,
+'''
+
+
+def write(tmpdir, name, content):
+    path = str(tmpdir.join(name))
+    f = open(path, 'w')
+    f.write(content)
+    f.close()
+    return path
+
+
+def run(args, stdin=''):
+    out = StringIO()
+    err = StringIO()
+    status = main(args, StringIO(stdin), out, err)
+    return status, out.getvalue(), err.getvalue()
+
+
+def test_jsonl(tmpdir):
+    path = write(tmpdir, 'in.jsonl', JSONL)
+    errors = str(tmpdir.join('errors.jsonl'))
+    status, out, err = run(['test_cli:schema', path,
+                            '--valid', '-', '--errors', errors])
+    assert status == 1
+    assert [json.loads(l) for l in out.splitlines()] == [
+        dict(name='bob', age=3, joined='2007-01-02'),
+        dict(name='jim', age=4, joined=None)]
+    assert [json.loads(l) for l in open(errors)] == [
+        dict(line=2,
+             record=dict(name='', age='x'),
+             errors=[[[], 'bad record'], [['age'], 'age'], [['name'], 'name']])]
+    lines = err.splitlines()
+    assert lines[0].startswith('3 records (2 valid, 1 invalid) in ')
+    assert lines[0].endswith(' records/sec')
+    assert len(lines) == 4
+
+
+def test_csv(tmpdir):
+    path = write(tmpdir, 'in.csv', CSV)
+    valid = str(tmpdir.join('valid.csv'))
+    status, out, err = run(['test_cli.schema', path, '--valid', valid,
+                            '--errors', '-', '-q'])
+    assert status == 1
+    assert open(valid).read().splitlines() == [
+        'age,joined,name', '3,2007-01-02,bob', '4,,jim']
+    assert json.loads(out)['line'] == 3
+    assert err == ''
+
+
+def test_stdin_and_workers():
+    status, out, err = run(['test_cli:schema', '--workers', '2',
+                            '--chunksize', '1', '--valid', '-'],
+                           JSONL.replace('"x"', '"5"').replace('""', '"al"'))
+    assert status == 0
+    assert len(out.splitlines()) == 3
+    assert err.startswith('3 records (3 valid, 0 invalid)')
+
+
+def test_file_and_workers(tmpdir):
+    path = write(tmpdir, 'in.csv', CSV)
+    status, out, err = run(['test_cli:schema', path, '--workers', '2',
+                            '--chunk-bytes', '1', '--errors', '-', '-q'])
+    assert status == 1
+    assert json.loads(out) == dict(
+        line=3,
+        record=dict(name='', age='x', joined=''),
+        errors=[[[], 'bad record'], [['age'], 'age'], [['name'], 'name']])
+
+
+def test_checkpoint(tmpdir):
+    path = write(tmpdir, 'in.csv', CSV)
+    checkpoint = str(tmpdir.join('checkpoint'))
+    valid = str(tmpdir.join('valid.csv'))
+    errors = str(tmpdir.join('errors.jsonl'))
+    args = ['test_cli:crashing', path, '--valid', valid, '--errors', errors,
+            '--checkpoint', checkpoint, '--checkpoint-interval', '0',
+            '--chunk-bytes', '1']
+    crash_on.append('jim')
+    try:
+        pytest.raises(RuntimeError, run, args)
+    finally:
+        del crash_on[:]
+    assert os.path.exists(checkpoint)
+    # output written after the last checkpoint is dropped on resuming
+    open(valid, 'a').write('4,,jim\r\n')
+    status, out, err = run(args)
+    assert status == 1
+    assert not os.path.exists(checkpoint)
+    assert open(valid).read().splitlines() == [
+        'age,joined,name', '3,2007-01-02,bob', '4,,jim']
+    assert [json.loads(l)['line'] for l in open(errors)] == [3]
+    assert err.startswith('3 records (2 valid, 1 invalid)')
+
+
+def test_checkpoint_needs_file():
+    pytest.raises(SystemExit, run, ['test_cli:schema', '--checkpoint', 'x'])
+
+
+def test_bad_input():
+    status, out, err = run(['test_cli:schema', '-q'], '{"name": \n')
+    assert status == 2
+    assert 'line 1: invalid JSON' in err
+
+
+def test_not_an_object(tmpdir):
+    for line in ('[1, 2]', '"x"'):
+        status, out, err = run(['test_cli:schema', '-q'],
+                               '{"name": "bob"}\n%s\n' % line)
+        assert status == 2
+        assert 'line 2: expected a JSON object' in err
+    path = write(tmpdir, 'in.jsonl', '[1, 2]\n')
+    status, out, err = run(['test_cli:schema', path, '-q', '-w', '2'])
+    assert status == 2
+    assert 'byte 0: expected a JSON object' in err
+
+
+def test_missing_input(tmpdir):
+    valid = str(tmpdir.join('valid.jsonl'))
+    missing = str(tmpdir.join('missing.jsonl'))
+    for workers in ('1', '2'):
+        status, out, err = run(['test_cli:schema', missing, '-w', workers,
+                                '--valid', valid])
+        assert status == 2
+        assert 'No such file or directory' in err
+        assert not os.path.exists(valid)
+
+
+def test_bad_context():
+    pytest.raises(SystemExit, run, ['test_cli:schema', '--context', '{x'])
+
+
+def test_python_m():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    p = subprocess.Popen([sys.executable, '-m', 'validino',
+                          'test_cli:schema', '--valid', '-'],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE, env=env,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    out, err = p.communicate(JSONL)
+    assert p.returncode == 1
+    assert len(out.splitlines()) == 2
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import py
+
+import validino as V
+
+
+def outcome(schema, data, context=None):
+    try:
+        return ('ok', schema(dict(data), context))
+    except V.Invalid, e:
+        return ('invalid', e.errors, e.unpack_errors())
+    except Exception, e:
+        return ('error', type(e))
+
+
+def assert_same(validators, inputs, context=None, **kw):
+    interpreted = V.Schema(dict(validators), **kw)
+    generated = V.Schema(dict(validators), codegen=True, **kw)
+    assert generated.compile().function is not None
+    assert interpreted.compile().function is None
+    for data in inputs:
+        expected = outcome(interpreted, data, context)
+        assert outcome(generated, data, context) == expected
+
+
+def in_context(value, context):
+    if value not in context:
+        raise V.Invalid("not in context")
+    return value
+
+
+def test_inlined_validators():
+    validators = dict(
+        name=(V.strip,
+              V.not_empty("Please enter a name"),
+              V.clamp_length(min=2, max=10, msg=dict(maxlen='too long!'))),
+        age=(V.default('0'), V.to_integer('not a number')),
+        state=(V.strip, V.default(''), V.belongs(['NY', 'NJ', ''])),
+        comment=V.clamp_length(max=5))
+    inputs = [
+        dict(name=' bob ', age='4', state='NY', comment='hi'),
+        dict(name='   ', age='four', state='CA', comment='too long'),
+        dict(name='b', state=' NJ '),
+        dict(name='bobbobbobbob', age=None),
+        dict(name=None, age=[], comment=5),
+        dict(),
+        ]
+    assert_same(validators, inputs)
+
+
+def test_messages():
+    validators = dict(
+        a=V.not_empty(msg=''),
+        b=V.not_empty(msg=dict(notempty=dict(x='nested'))),
+        c=V.to_integer(msg=['listed']),
+        d=V.belongs([1, 2], msg=dict(other='unused')))
+    inputs = [dict(), dict(a='x', b='y', c='1', d=1), dict(c='one', d=3)]
+    assert_same(validators, inputs)
+
+
+def test_called_validators():
+    def fail_on_field(value, context=None):
+        if value == 'bad':
+            raise V.Invalid("bad value", field='other')
+        return value.upper()
+    validators = dict(
+        x=(V.strip, fail_on_field, V.clamp_length(max=3)),
+        y=V.either(V.empty(), V.all_of(V.to_integer(), V.clamp(min=5))),
+        z=V.all_of(V.strip, V.all_of(V.not_empty(), in_context)),
+        w=in_context,
+        n=V.nested(a=V.to_integer()))
+    inputs = [
+        dict(x=' ab ', y='', z=' foo ', w='foo', n=dict(a='1')),
+        dict(x='bad', y='3', z='bar', w='bar', n=dict()),
+        dict(x='abcd', y='six', z='', w=None, n=None),
+        ]
+    assert_same(validators, inputs, context=['foo', 'AB'])
+
+
+def test_plural_keys():
+    validators = {
+        'email': (V.strip, V.not_empty()),
+        'confirm': V.strip,
+        ('email', 'confirm'): V.fields_equal('no match', field='confirm'),
+        ('a', 'b'): (V.only_one_of('only one'), V.default(None)),
+        }
+    inputs = [
+        dict(email=' a@b ', confirm='a@b'),
+        dict(email='a@b', confirm='c@d', a=1, b=1),
+        dict(email='', confirm=''),
+        ]
+    assert_same(validators, inputs)
+    assert_same(validators, inputs, filter_extra=False)
+    assert_same(validators, inputs, fail_fast=True)
+
+
+def test_skipped_plural_keys():
+    validators = {
+        'email': V.not_empty(),
+        'confirm': V.to_integer(),
+        ('email', 'confirm'): V.fields_equal('no match', field='confirm'),
+        ('confirm', 'other'): (V.fields_equal('unused'), V.default(None)),
+        }
+    inputs = [
+        dict(email='', confirm='1', other=1),
+        dict(email='a', confirm='x', other='x'),
+        dict(email=1, confirm='1', other='1'),
+        dict(email=1, confirm='1', other=1),
+        ]
+    assert_same(validators, inputs)
+    assert_same(validators, inputs, fail_fast=True)
+
+
+def test_schema_options():
+    validators = dict(
+        x=(V.to_integer(), V.clamp(max=10)),
+        y=V.default('y'))
+    inputs = [dict(x='1'), dict(x='1', y=2, z=3), dict(y=1), dict(x='11', y=2)]
+    assert_same(validators, inputs, allow_extra=False)
+    assert_same(validators, inputs, allow_missing=False)
+    assert_same(validators, inputs, filter_extra=False)
+    assert_same(validators, inputs, msg=dict(schema_error='oops'))
+    assert_same(validators, inputs, fail_fast=True)
+    assert_same(validators, inputs, context={V.FAIL_FAST: True})
+
+
+def test_unexpected_exceptions_propagate():
+    validators = dict(x=V.clamp_length(max=2))
+    assert_same(validators, [dict(x=5), dict(x='abc')])
+    s = V.Schema(validators, codegen=True)
+    with py.test.raises(TypeError):
+        s(dict(x=5))
+
+
+def test_source():
+    s = V.Schema(dict(x=(V.strip, V.to_integer())), codegen=True)
+    source = s.compile().source
+    assert 'int(v)' in source
+    assert 'v.strip()' in source
+    assert V.Schema(dict(), codegen=True)(dict(x=1)) == dict()
@@ -84,7 +84,9 @@ def test_credit_card_3():
         s(data)
     except V.Invalid, e:
         errors = e.unpack_errors()
-        assert set(errors) == set(('cc_card', 'cc_type', None))
+        # the (cc_card, cc_type) validator is skipped altogether once
+        # cc_type has failed, so cc_card gets no error of its own
+        assert set(errors) == set(('cc_type', None))
     else:
         assert False, "there should be an error"
 
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import validino as V
+from validino.files import (chunk_ranges, load_checkpoint, save_checkpoint,
+                            validate_chunks, validate_file)
+
+
+schema = V.Schema(dict(
+    name=V.not_empty('name'),
+    age=V.to_integer('age')),
+    msg='bad record')
+
+
+JSONL = '''\
+{"name": "bob", "age": "3"}
+{"name": "", "age": "x"}
+
+{"name": "jim", "age": "4"}
+{"name": "al", "age": "y"}'''
+
+CSV = '''\
+name,age
+bob,3
+,x
+jim,4
+al,y
+'''
+
+
+def write(tmpdir, name, content):
+    path = str(tmpdir.join(name))
+    f = open(path, 'wb')
+    f.write(content)
+    f.close()
+    return path
+
+
+def test_chunk_ranges(tmpdir):
+    path = write(tmpdir, 'in.jsonl', JSONL)
+    ranges = chunk_ranges(path, 20)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(JSONL)
+    for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert JSONL[end - 1] == '\n'
+    assert len(ranges) == 4
+    assert chunk_ranges(path, 1 << 20) == [(0, len(JSONL))]
+    assert chunk_ranges(path, 20, ranges[2][0]) == ranges[2:]
+    assert chunk_ranges(write(tmpdir, 'empty', ''), 30) == []
+
+
+@pytest.mark.parametrize('chunk_bytes', [1, 30, 1 << 20])
+def test_validate_file_jsonl(tmpdir, chunk_bytes):
+    path = write(tmpdir, 'in.jsonl', JSONL)
+    results = list(validate_file(schema, path, workers=1,
+                                 chunk_bytes=chunk_bytes, compact=True))
+    assert [lineno for lineno, result, errors in results] == [1, 2, 4, 5]
+    assert results[0] == (1, dict(name='bob', age=3), None)
+    assert results[1][2] == (((), 'bad record'), (('age',), 'age'),
+                             (('name',), 'name'))
+    assert results[3][2] == (((), 'bad record'), (('age',), 'age'))
+
+
+def test_validate_file_csv_workers(tmpdir):
+    path = write(tmpdir, 'in.csv', CSV)
+    results = list(validate_file('test_files:schema', path, workers=2,
+                                 chunk_bytes=8, records=True))
+    assert [r[0] for r in results] == [2, 3, 4, 5]
+    assert results[0] == (2, dict(name='bob', age=3), None, None)
+    lineno, result, errors, record = results[1]
+    assert record == dict(name='', age='x')
+    assert errors == {None: 'bad record', 'age': 'age', 'name': 'name'}
+
+
+def test_validate_file_invalid_json(tmpdir):
+    path = write(tmpdir, 'in.jsonl', JSONL.replace('"jim"', 'jim'))
+    with pytest.raises(ValueError) as info:
+        list(validate_file(schema, path, workers=1, chunk_bytes=30))
+    assert 'byte 54: invalid JSON' in str(info.value)
+
+
+def test_validate_chunks_resume(tmpdir):
+    path = write(tmpdir, 'in.csv', CSV)
+    chunks = list(validate_chunks(schema, path, workers=1, chunk_bytes=1))
+    assert [lineno for end, lineno, results in chunks] == [2, 3, 4, 5]
+    assert chunks[-1][0] == len(CSV)
+    end, lineno, results = chunks[1]
+    resumed = list(validate_chunks(schema, path, workers=1, chunk_bytes=1,
+                                   start=end, lineno=lineno))
+    assert resumed == chunks[2:]
+
+
+def test_checkpoint_files(tmpdir):
+    path = str(tmpdir.join('checkpoint'))
+    assert load_checkpoint(path) is None
+    save_checkpoint(path, dict(offset=10))
+    save_checkpoint(path, dict(offset=20))
+    assert load_checkpoint(path) == dict(offset=20)
+    assert tmpdir.listdir() == [tmpdir.join('checkpoint')]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import validino as V
+from validino.memory import MemoryProfile
+from validino.util import compact_errors, intern_value
+
+
+schema = V.Schema(dict(
+    name=V.not_empty('name'),
+    age=V.to_integer('age'),
+    address=V.nested(zip=V.clamp_length(max=5, msg='zip'))),
+    msg='bad record')
+
+
+def records(n):
+    for i in xrange(n):
+        if i % 2:
+            yield dict(name='', age='x', address=dict(zip='123456'))
+        else:
+            yield dict(name='bob', age=str(i), address=dict(zip='12345'))
+
+
+def test_compact_errors():
+    errors = {None: 'bad record',
+              'name': 'name',
+              'address': {'zip': 'zip', 'lines': {0: 'line'}}}
+    assert compact_errors(errors) == (
+        ((), 'bad record'),
+        (('address', 'lines', 0), 'line'),
+        (('address', 'zip'), 'zip'),
+        (('name',), 'name'))
+    table = {}
+    assert compact_errors(dict(errors), table) is \
+           compact_errors(errors, table)
+    assert compact_errors(errors, {}) is not compact_errors(errors, table)
+    assert compact_errors({}) == ()
+    try:
+        schema(dict(name='', age='1', address=dict(zip='12')))
+    except V.Invalid, e:
+        assert e.compact_errors() == (((), 'bad record'), (('name',), 'name'))
+    else:
+        assert False, "there should be an error"
+
+
+def test_intern_value():
+    a = ('x', 'y' * 100)
+    b = ('x', 'y' * 100)
+    table = {}
+    assert intern_value(a, table) is intern_value(b, table) is a
+    assert intern_value(b, {}) is b
+    assert intern_value([1], table) == [1]
+    assert type(intern_value(u'unicode message', table)) is unicode
+    assert type(intern_value('unicode message', table)) is str
+    assert len(table) == 2
+
+
+def test_validate_many_compact():
+    full = list(schema.validate_many(records(4)))
+    compact = list(schema.validate_many(records(4), compact=True))
+    assert [r[:2] for r in compact] == [r[:2] for r in full]
+    assert compact[0][2] is None
+    assert compact[1][2] == compact_errors(full[1][2])
+    assert compact[1][2] is compact[3][2]
+
+
+def test_profile_memory():
+    full = V.profile_memory(schema, records(100))
+    compact = V.profile_memory(schema, records(100), compact=True)
+    assert isinstance(full, MemoryProfile)
+    assert (full.valid, full.invalid) == (50, 50)
+    assert full.bytes_per_valid == compact.bytes_per_valid > 0
+    assert 0 < compact.invalid_bytes < full.invalid_bytes
+    assert '50 invalid records' in str(full)
+    empty = V.profile_memory(schema, [])
+    assert empty.bytes_per_valid == empty.bytes_per_invalid == 0
+
+
+def test_deep_size():
+    message = 'x' * 1000
+    assert V.deep_size([message, message]) < 2 * len(message)
+    assert V.deep_size(V.Invalid({'a': message})) > len(message)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+import cProfile
+import pstats
+
+import py
+
+import validino as V
+from validino.observe import Stats, Timing
+
+
+def broken(value, context=None):
+    if value == 'boom':
+        raise ValueError(value)
+    return value
+
+
+def pair(values, context=None):
+    return values
+
+
+def make_schema(**kw):
+    return V.Schema({
+        'name': (V.strip, V.not_empty('empty')),
+        'age': V.to_integer('age'),
+        'other': broken,
+        ('name', 'age'): pair},
+        **kw)
+
+
+def test_observer():
+    stats = Stats()
+    s = make_schema(observer=stats, codegen=True)
+    s(dict(name=' bob ', age='3'))
+    py.test.raises(V.Invalid, s, dict(name='', age='x'))
+    py.test.raises(ValueError, s, dict(name='bob', age='3', other='boom'))
+    assert sorted(stats.fields) == ['age', 'name', 'name,age', 'other']
+    assert sorted(stats.validators) == [
+        'age[0]:to_integer',
+        'name,age[0]:pair',
+        'name[0]:strip',
+        'name[1]:not_empty',
+        'other[0]:broken']
+    name = stats.fields['name']
+    assert (name.calls, name.failures, name.errors) == (3, 1, 0)
+    assert stats.validators['name[0]:strip'].calls == 3
+    assert stats.validators['name[1]:not_empty'].failures == 1
+    assert stats.fields['name,age'].calls == 1
+    other = stats.validators['other[0]:broken']
+    assert (other.calls, other.failures, other.errors) == (3, 0, 1)
+    assert name.seconds > 0
+    report = stats.report().splitlines()
+    assert report[0].split() == ['name', 'calls', 'failures', 'errors',
+                                 'seconds']
+    assert len(report) == 10
+    stats.clear()
+    assert stats.fields == stats.validators == {}
+
+
+def test_instrument():
+    stats = Stats()
+    s = make_schema()
+    own = Stats()
+    s2 = make_schema(observer=own)
+    with V.instrument(stats) as observer:
+        assert observer is stats
+        s(dict(name='bob', age='1'))
+        s2(dict(name='bob', age='1'))
+    s(dict(name='bob', age='1'))
+    assert stats.fields['name'].calls == 1
+    assert own.fields['name'].calls == 1
+    assert isinstance(stats.fields['age'], Timing)
+
+
+def test_observed_partial_and_revalidate():
+    stats = Stats()
+    s = make_schema(observer=stats)
+    s.validate_partial(dict(age='3'))
+    assert sorted(stats.fields) == ['age']
+    state = s.revalidate(None, dict(name='bob', age='3'))
+    s.revalidate(state, dict(name='bob', age='4'))
+    # name is run again for the plural key, but not other
+    assert stats.fields['age'].calls == 3
+    assert stats.fields['name'].calls == 2
+    assert stats.fields['other'].calls == 1
+    with V.instrument(stats):
+        make_schema().validate_partial(dict(name='al'))
+    assert stats.fields['name'].calls == 3
+
+
+def test_memoized_names():
+    stats = Stats()
+    s = make_schema(observer=stats, cache_size=10)
+    s(dict(name='bob', age='3'))
+    assert 'age[0]:to_integer' in stats.validators
+    assert not [n for n in stats.validators if 'memoize' in n]
+
+
+def test_profiler_names():
+    s = make_schema()
+    profile = cProfile.Profile()
+    with V.instrument(Stats()):
+        profile.runcall(s, dict(name='bob', age='1'))
+    names = set(f[2] for f in pstats.Stats(profile).stats)
+    assert 'validate_name_1_not_empty' in names
+    assert 'validate_name_age' in names
+    assert 'validate_age_0_to_integer' in names
+
+
+def test_observed_steps_are_not_kept():
+    import gc
+    s = make_schema()
+    for i in range(10):
+        with V.instrument(Stats()):
+            s(dict(name='bob', age='1', other='x'))
+    gc.collect()
+    assert len(s.compile()._observed) == 0
+    stats = Stats()
+    with V.instrument(stats):
+        s(dict(name='bob', age='1', other='x'))
+        s(dict(name='bob', age='1', other='x'))
+    assert len(s.compile()._observed) == 1
+    assert stats.fields['name'].calls == 2
+
+
+def test_schema_observer_pickle():
+    import pickle
+    stats = Stats()
+    s = make_schema(observer=stats)
+    s2 = pickle.loads(pickle.dumps(s))
+    assert s2.observer is None
+    assert s2 == s == make_schema()
+    assert hash(s) == hash(make_schema())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import py
+
+import validino as V
+from validino.parallel import load_schema, validate_parallel
+
+
+schema = V.Schema(
+    dict(
+        foo=(V.strip, V.to_integer(msg='not an integer')),
+        bar=V.default('bar')),
+    msg='schema')
+
+
+def records(n):
+    for i in xrange(n):
+        if i % 7 == 3:
+            yield dict(foo='x%d' % i)
+        else:
+            yield dict(foo=' %d ' % i)
+
+
+def test_load_schema():
+    assert load_schema('test_parallel:schema') is schema
+    assert load_schema('test_parallel.schema') is schema
+    assert load_schema('validino.parallel:validate_parallel') is validate_parallel
+
+
+def test_validate_parallel():
+    expected = list(schema.validate_many(records(1000)))
+    result = list(validate_parallel(schema, records(1000),
+                                    workers=3, chunksize=17))
+    assert result == expected
+    assert [r[0] for r in result] == range(1000)
+    assert result[3] == (3, None, {None: 'schema', 'foo': 'not an integer'})
+    assert result[4] == (4, dict(foo=4, bar='bar'), None)
+
+
+def test_validate_parallel_dotted_path():
+    expected = list(schema.validate_many(records(100)))
+    result = list(validate_parallel('test_parallel:schema', records(100),
+                                    workers=2, chunksize=10))
+    assert result == expected
+
+
+def test_validate_parallel_context():
+    def in_context(value, context):
+        if value not in context['allowed']:
+            raise V.Invalid('not allowed')
+        return value
+    s = V.Schema(dict(foo=in_context))
+    data = [dict(foo=1), dict(foo=2)]
+    result = list(validate_parallel(s, data, workers=2, chunksize=1,
+                                    context=dict(allowed=[2])))
+    assert result == [
+        (0, None, {None: 'Problems were found in the submitted data.',
+                   'foo': 'not allowed'}),
+        (1, dict(foo=2), None)]
+
+
+def test_validate_parallel_errors_propagate():
+    def broken(value, context=None):
+        raise ValueError(value)
+    s = V.Schema(dict(foo=broken))
+    with py.test.raises(ValueError):
+        list(validate_parallel(s, [dict(foo=1)], workers=1))
+
+
+def test_validate_parallel_compact():
+    expected = list(schema.validate_many(records(100), compact=True))
+    result = list(validate_parallel(schema, records(100), workers=2,
+                                    chunksize=10, compact=True))
+    assert result == expected
+    assert result[3][2] is result[10][2]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import validino as V
+from validino.report import ErrorCount
+
+
+schema = V.Schema(dict(
+    name=V.not_empty('name'),
+    age=V.to_integer('age')),
+    msg='bad record')
+
+
+def records(n):
+    for i in xrange(n):
+        if i % 10 == 0:
+            yield dict(name='', age='x')
+        elif i % 2:
+            yield dict(name='bob', age='x')
+        else:
+            yield dict(name='bob', age=str(i))
+
+
+def test_error_collector():
+    c = V.ErrorCollector(examples=3, sample_size=5, seed=1)
+    valid = list(c.consume(schema.validate_many(records(1000))))
+    assert len(valid) == 400
+    assert valid[0] == (2, dict(name='bob', age=2))
+    assert (c.records, c.invalid) == (1000, 600)
+    assert c.counts[((), 'bad record')].count == 600
+    assert c.counts[(('age',), 'age')].count == 600
+    names = c.counts[(('name',), 'name')]
+    assert isinstance(names, ErrorCount)
+    assert names.count == 100
+    assert len(names.sample) == 5
+    assert all(i % 10 == 0 for i in names.sample)
+    assert len(set(names.sample)) == 5
+    assert c.examples[('age',)] == [0, 1, 3]
+    assert c.examples[('name',)] == [0, 10, 20]
+    assert c.most_common(1)[0][1].count == 600
+    report = c.report().splitlines()
+    assert report[0] == '1000 records, 600 invalid'
+    assert report[-1].split()[:3] == ['100', 'name:', 'name']
+    assert '(first records 0, 10, 20; e.g. records ' in report[-1]
+    assert '(first records 0, 1, 3; e.g. records ' in report[2]
+
+
+def test_error_collector_formats_and_limits():
+    c = V.ErrorCollector(max_errors=2)
+    c.add(0, {None: 'bad', 'x': {'y': 'z'}})
+    c.add(1, (((), 'bad'), (('x', 'y'), 'z')))
+    c.add(2, {'other': 'error'})
+    c.add(3, None)
+    assert c.counts[(('x', 'y'), 'z')].count == 2
+    assert c.overflow == 1
+    assert (c.records, c.invalid) == (4, 3)
+    assert c.report().splitlines()[-1].split() == ['1', 'other', 'errors']
+
+
+def test_error_collector_memory_is_bounded():
+    c = V.ErrorCollector(sample_size=10, seed=0)
+    for i in xrange(20000):
+        c.add(i, {None: 'bad'})
+    counted = c.counts[((), 'bad')]
+    assert counted.count == 20000
+    assert len(counted.sample) == 10
+    # the sample is spread over the whole batch
+    assert max(counted.sample) > 10000
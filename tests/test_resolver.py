@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+import threading
+import time
+
+import py
+
+import validino as V
+from validino import resolver
+from validino.resolver import (CachingResolver, ResolverError,
+                               set_default_resolver)
+
+
+class StubResolver(object):
+    """
+    answers from a dictionary of domains to (hosts, ttl) tuples,
+    failing for the other domains, optionally waiting for an event
+    first.
+    """
+
+    def __init__(self, answers, event=None):
+        self.answers = answers
+        self.event = event
+        self.lookups = []
+
+    def lookup(self, domain):
+        self.lookups.append(domain)
+        if self.event is not None:
+            self.event.wait()
+        try:
+            return self.answers[domain]
+        except KeyError:
+            raise ResolverError(domain)
+
+
+def test_caching_resolver():
+    stub = StubResolver({'example.com': (['mx.example.com'], 60),
+                         'nomail.com': ([], 3600),
+                         'short.com': (['mx.short.com'], 0.05),
+                         'nottl.com': (['mx.nottl.com'], None)})
+    r = CachingResolver(stub, negative_ttl=30, default_ttl=10)
+    assert r.lookup('example.com') == (['mx.example.com'], 60)
+    hosts, ttl = r.lookup('EXAMPLE.com')
+    assert hosts == ['mx.example.com'] and 59 < ttl <= 60
+    assert stub.lookups == ['example.com']
+    # answers without hosts are kept for negative_ttl at most
+    assert r.lookup('nomail.com') == ([], 30)
+    assert r.lookup('nottl.com') == (['mx.nottl.com'], 10)
+    # answers expire with their ttl
+    r.lookup('short.com')
+    r.lookup('short.com')
+    time.sleep(0.1)
+    r.lookup('short.com')
+    assert stub.lookups.count('short.com') == 2
+    # failures are not cached
+    for i in range(2):
+        py.test.raises(ResolverError, r.lookup, 'broken.com')
+    assert stub.lookups.count('broken.com') == 2
+    assert (r.hits, r.misses, r.coalesced) == (2, 7, 0)
+    r.clear()
+    r.lookup('example.com')
+    assert stub.lookups.count('example.com') == 2
+
+
+def test_caching_resolver_coalesces():
+    event = threading.Event()
+    stub = StubResolver({'example.com': (['mx.example.com'], 60)}, event)
+    r = CachingResolver(stub)
+    results = []
+    def lookup(domain):
+        try:
+            results.append(r.lookup(domain))
+        except ResolverError, e:
+            results.append(e)
+    threads = [threading.Thread(target=lookup, args=(domain,))
+               for domain in ['example.com'] * 5 + ['broken.com'] * 3]
+    for t in threads:
+        t.start()
+    while r.misses + r.coalesced < len(threads):
+        time.sleep(0.01)
+    event.set()
+    for t in threads:
+        t.join()
+    assert sorted(stub.lookups) == ['broken.com', 'example.com']
+    assert results.count((['mx.example.com'], 60)) == 5
+    assert len([e for e in results if isinstance(e, ResolverError)]) == 3
+    assert r.coalesced == 6
+
+
+def test_caching_resolver_counts_hits():
+    r = CachingResolver(StubResolver({'example.com': (['mx.example.com'],
+                                                       60)}))
+    r.lookup('example.com')
+    def lookup():
+        for i in range(2000):
+            r.lookup('example.com')
+    threads = [threading.Thread(target=lookup) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (r.hits, r.misses) == (16000, 1)
+
+
+def test_email_resolver():
+    stub = StubResolver({'example.com': (['mx.example.com'], 60),
+                         'nomail.com': ([], 60)})
+    v = V.email(check_dns=True, resolver=CachingResolver(stub))
+    assert v.io_bound and not v.pure
+    assert v('bob@example.com') == 'bob@example.com'
+    assert v('al@example.com') == 'al@example.com'
+    assert stub.lookups == ['example.com']
+    py.test.raises(V.Invalid, v, 'bob@nomail.com')
+    try:
+        v('bob@broken.com')
+    except V.Invalid, e:
+        assert e.unpack_errors() == {None: 'socket error'}
+    else:
+        assert False
+
+
+def test_email_resolver_pickle():
+    stub = StubResolver({'example.com': (['mx.example.com'], 60)})
+    v = V.email(check_dns=True, resolver=CachingResolver(stub))
+    set_default_resolver(stub)
+    try:
+        v2 = pickle.loads(pickle.dumps(v))
+        assert v2.resolver is None
+        assert v2 == v
+        assert v2('bob@example.com') == 'bob@example.com'
+        assert stub.lookups == ['example.com']
+    finally:
+        set_default_resolver(None)
+
+
+def test_default_resolver():
+    stub = StubResolver({'example.com': (['mx.example.com'], 60)})
+    set_default_resolver(stub)
+    try:
+        assert resolver.default_resolver() is stub
+        v = V.email(check_dns=True)
+        assert v('bob@example.com') == 'bob@example.com'
+        assert stub.lookups == ['example.com']
+    finally:
+        set_default_resolver(None)
+    if resolver.DNS is None:
+        py.test.raises(RuntimeError, V.email, check_dns=True)